@@ -0,0 +1,192 @@
+import argparse
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+from sync_logging import configure_logging
+
+REQUIRED_KEYS = ("canvas_api_key", "canvas_domain", "notion_api_key", "notion_database_id")
+
+# CanvasNotionSync options an account may set for itself
+ACCOUNT_OPTIONS = ("canvas_rate", "notion_rate", "canvas_concurrency", "notion_concurrency",
+                   "max_retries", "canvas_graphql", "concurrent", "queue_size", "archive_orphans")
+
+# Rate options and the token each one limits. Accounts that share a token split its rate.
+SHARED_RATES = (("canvas_rate", "canvas_api_key"), ("notion_rate", "notion_api_key"))
+
+# Command line paths that are kept per account, inside the account's directory
+ACCOUNT_PATHS = ("state_file", "journal_file", "cache_dir", "metrics_json", "metrics_prom", "profile", "plan_file")
+
+_ACCOUNT_NAME = re.compile(r"^[\w.-]+$")
+
+
+def load_accounts(path: str) -> List[Dict]:
+    """Read the accounts to sync from a JSON config file.
+
+    The file holds ``{"defaults": {...}, "accounts": [{...}, ...]}``. Each
+    account needs a unique ``name`` and the four credentials in
+    REQUIRED_KEYS, and may set any of ACCOUNT_OPTIONS; defaults fill in
+    whatever an account leaves out. A value of ``"env:NAME"`` is read from
+    the environment variable NAME so tokens can stay out of the file.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    defaults = config.get("defaults", {})
+    accounts = []
+    names = set()
+    for entry in config.get("accounts", []):
+        account = {**defaults, **entry}
+        for key, value in account.items():
+            if isinstance(value, str) and value.startswith("env:"):
+                account[key] = os.getenv(value[4:])
+
+        name = account.get("name")
+        if not name or not _ACCOUNT_NAME.match(str(name)):
+            raise ValueError(f"Account names must be letters, digits, '.', '-' or '_': {name!r}")
+        if name in names:
+            raise ValueError(f"Duplicate account name: {name}")
+        missing = [key for key in REQUIRED_KEYS if not account.get(key)]
+        if missing:
+            raise ValueError(f"Account {name} is missing {', '.join(missing)}")
+        unknown = set(account) - set(REQUIRED_KEYS) - set(ACCOUNT_OPTIONS) - {"name", "canvas_base_url", "notion_base_url"}
+        if unknown:
+            raise ValueError(f"Account {name} has unknown settings: {', '.join(sorted(unknown))}")
+
+        names.add(name)
+        accounts.append(account)
+    return accounts
+
+
+def share_rates(accounts: List[Dict], workers: int, defaults: Optional[Dict] = None) -> List[Dict]:
+    """Scale each account's rates so accounts sharing a token stay within that token's limit together.
+
+    Each worker process has its own rate limiter, so with k accounts on
+    one token and up to k of them running at once, each gets 1/k of the
+    rate. ``defaults`` gives the rate of an account that doesn't set one.
+    """
+    defaults = defaults or {}
+    shared = []
+    for account in accounts:
+        account = dict(account)
+        for rate_key, token_key in SHARED_RATES:
+            sharing = sum(1 for other in accounts if other[token_key] == account[token_key])
+            concurrent = min(workers, sharing)
+            rate = account.get(rate_key, defaults.get(rate_key))
+            if concurrent > 1 and rate is not None:
+                account[rate_key] = rate / concurrent
+        shared.append(account)
+    return shared
+
+
+def run_account(account: Dict, args: argparse.Namespace) -> Dict:
+    """Sync one account in a worker process and report how it went"""
+    # Imported here because main imports this module
+    from main import build_syncer, configure_logging_from_args, run_sync_mode
+
+    name = account["name"]
+    account_dir = os.path.abspath(os.path.join(args.batch_dir, name))
+    os.makedirs(account_dir, exist_ok=True)
+
+    account_args = argparse.Namespace(**vars(args))
+    for key in ACCOUNT_PATHS:
+        value = getattr(account_args, key, None)
+        if value and not os.path.isabs(value):
+            setattr(account_args, key, os.path.join(account_dir, value))
+
+    # Worker processes may inherit the parent's handlers; each account logs to its own file
+    configure_logging_from_args(account_args, path=os.path.join(account_dir, os.path.basename(args.log_file)),
+                                console=False)
+    logger = logging.getLogger(__name__)
+
+    result = {"name": name, "ok": False, "seconds": 0.0, "stats": {}, "calls": {}, "error": None}
+    started = time.perf_counter()
+    syncer = None
+    try:
+        options = {key: account[key] for key in ACCOUNT_OPTIONS if key in account}
+        syncer = build_syncer(account_args, account["canvas_api_key"], account["canvas_domain"],
+                              account["notion_api_key"], account["notion_database_id"], **options)
+        # Overrides for proxies or test servers
+        if account.get("canvas_base_url"):
+            syncer.canvas_base_url = account["canvas_base_url"]
+        if account.get("notion_base_url"):
+            syncer.notion_base_url = account["notion_base_url"]
+
+        run_sync_mode(syncer, account_args)
+        result["ok"] = True
+    except Exception as e:
+        logger.error(f"Sync failed: {str(e)}")
+        result["error"] = str(e)
+    finally:
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        if syncer is not None:
+            result["stats"] = dict(syncer.stats)
+            for api, endpoints in syncer.metrics.to_dict()["calls"].items():
+                result["calls"][api] = sum(sum(statuses.values()) for statuses in endpoints.values())
+            syncer.close()
+    return result
+
+
+def run_batch(accounts: List[Dict], args: argparse.Namespace) -> List[Dict]:
+    """Sync every account across a process pool and write the aggregate report"""
+    configure_logging()
+    logger = logging.getLogger(__name__)
+    logger.info(f"Syncing {len(accounts)} accounts with {args.batch_workers} workers")
+
+    started = time.perf_counter()
+    results: Dict[str, Dict] = {}
+    workers = max(1, args.batch_workers)
+    accounts = share_rates(accounts, workers, {"canvas_rate": args.canvas_rate, "notion_rate": args.notion_rate})
+    broken = _run_pool(accounts, args, workers, results)
+
+    # A worker that dies takes the whole pool down with it. Rerun each affected
+    # account in a pool of its own so only the one that crashes is marked failed.
+    for account in broken:
+        if _run_pool([account], args, 1, results):
+            results[account["name"]] = _failed(account["name"], "worker process died")
+
+    ordered = [results[account["name"]] for account in accounts]
+    for result in ordered:
+        if result["ok"]:
+            logger.info(f"{result['name']}: ok in {result['seconds']:.1f}s, {result['stats']}")
+        else:
+            logger.error(f"{result['name']}: failed after {result['seconds']:.1f}s: {result['error']}")
+
+    report = {
+        "accounts": len(ordered),
+        "succeeded": sum(1 for result in ordered if result["ok"]),
+        "failed": sum(1 for result in ordered if not result["ok"]),
+        "wall_seconds": round(time.perf_counter() - started, 3),
+        "results": ordered
+    }
+    logger.info(f"Batch finished: {report['succeeded']} succeeded, {report['failed']} failed "
+                f"in {report['wall_seconds']:.1f}s")
+    if args.batch_report:
+        with open(args.batch_report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return ordered
+
+
+def _run_pool(accounts: List[Dict], args: argparse.Namespace, workers: int, results: Dict[str, Dict]) -> List[Dict]:
+    """Run accounts on a process pool, filling in results; returns the accounts lost to a broken pool"""
+    broken = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(accounts)) or 1) as executor:
+        futures = {executor.submit(run_account, account, args): account for account in accounts}
+        for future in as_completed(futures):
+            account = futures[future]
+            try:
+                results[account["name"]] = future.result()
+            except BrokenProcessPool:
+                broken.append(account)
+            except Exception as e:
+                results[account["name"]] = _failed(account["name"], str(e))
+    return broken
+
+
+def _failed(name: str, error: str) -> Dict:
+    return {"name": name, "ok": False, "seconds": 0.0, "stats": {}, "calls": {}, "error": error}
@@ -0,0 +1,144 @@
+import json
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from records import Assignment, Course, parse_timestamp, points_value
+from transport import HttpTransport
+
+# Through the user's own enrollments, so the role and state can be checked like the REST
+# enrollment_type=student&enrollment_state=active filter; allCourses has every role
+COURSES_QUERY = """
+query SyncCourses {
+  currentUser {
+    enrollments {
+      type
+      state
+      course {
+        _id
+        name
+        term { name }
+      }
+    }
+  }
+}
+"""
+
+# Selected for every assignment; the submissions connection only holds the current user's own
+ASSIGNMENT_FIELDS = """
+      nodes {
+        _id
+        name
+        dueAt
+        pointsPossible
+        htmlUrl
+        updatedAt
+        submissionsConnection(first: 1) { nodes { submittedAt gradedAt } }
+      }
+      pageInfo { hasNextPage endCursor }
+"""
+
+
+class CanvasGraphQLError(Exception):
+    """Canvas answered a GraphQL query with errors instead of data"""
+
+
+def utc_timestamp(value: Optional[str]) -> Optional[str]:
+    """Convert a GraphQL ISO 8601 timestamp to the UTC ``...Z`` form the REST API returns"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)
+    return parsed.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class CanvasGraphQL:
+    """Fetches courses, assignments and submissions through Canvas GraphQL.
+
+    Courses come from one query. Assignments for every course are then
+    requested together, one aliased field per course, so a semester takes
+    one round trip per page of the longest course instead of one REST call
+    per course and page. Records come back as the same Course and
+    Assignment the REST path builds, with ``updated_at`` in the REST
+    API's form, so the rest of the sync can't tell the two apart.
+    """
+
+    def __init__(self, transport: HttpTransport, url: str, page_size: int = 100):
+        self.transport = transport
+        self.url = url
+        self.page_size = page_size
+
+    def query(self, query: str) -> Dict:
+        """Run a query and return its data"""
+        # Queries only read, so they're safe to retry like a GET
+        response = self.transport.request("POST", self.url, json={"query": query})
+        response.raise_for_status()
+        body = response.json()
+        if body.get("errors"):
+            messages = "; ".join(error.get("message", "unknown error") for error in body["errors"])
+            raise CanvasGraphQLError(messages)
+        return body["data"]
+
+    def courses(self) -> List[Course]:
+        """Courses the user is an active student in.
+
+        In any other role, the one submission requested per assignment
+        would be some other student's.
+        """
+        courses: Dict[int, Course] = {}
+        for enrollment in self.query(COURSES_QUERY)["currentUser"]["enrollments"]:
+            if enrollment.get("type") != "StudentEnrollment" or enrollment.get("state") != "active":
+                continue
+            course = enrollment["course"]
+            course_id = int(course["_id"])
+            courses[course_id] = Course(course_id, course["name"], (course.get("term") or {}).get("name", ""))
+        return list(courses.values())
+
+    def assignments(self, course_ids: List[int]) -> Dict[int, List[Assignment]]:
+        """Every assignment in the given courses, keyed by course id"""
+        result: Dict[int, List[Assignment]] = {course_id: [] for course_id in course_ids}
+        pending: List[Tuple[int, Optional[str]]] = [(course_id, None) for course_id in course_ids]
+
+        while pending:
+            data = self.query(self._assignments_query(pending))
+            next_pending = []
+            for course_id, _ in pending:
+                course = data.get(f"c{course_id}")
+                if course is None:
+                    raise CanvasGraphQLError(f"Course {course_id} not returned")
+                connection = course["assignmentsConnection"]
+                result[course_id].extend(self._assignment(node) for node in connection["nodes"])
+                if connection["pageInfo"]["hasNextPage"]:
+                    next_pending.append((course_id, connection["pageInfo"]["endCursor"]))
+            pending = next_pending
+
+        return result
+
+    def _assignments_query(self, pending: List[Tuple[int, Optional[str]]]) -> str:
+        fields = []
+        for course_id, cursor in pending:
+            after = f", after: {json.dumps(cursor)}" if cursor else ""
+            fields.append(
+                f'  c{course_id}: course(id: "{course_id}") {{\n'
+                f'    assignmentsConnection(first: {self.page_size}{after}) {{{ASSIGNMENT_FIELDS}    }}\n'
+                f'  }}'
+            )
+        return "query SyncAssignments {\n" + "\n".join(fields) + "\n}\n"
+
+    @staticmethod
+    def _assignment(node: Dict) -> Assignment:
+        submissions = node.get("submissionsConnection", {}).get("nodes") or []
+        submission = submissions[0] if submissions else {}
+        if submission.get("submittedAt"):
+            status = "Graded" if submission.get("gradedAt") else "Submitted"
+        else:
+            status = "Not Submitted"
+        return Assignment(
+            int(node["_id"]),
+            node["name"],
+            parse_timestamp(node.get("dueAt")),
+            points_value(node.get("pointsPossible")),
+            node.get("htmlUrl"),
+            utc_timestamp(node.get("updatedAt")),
+            status
+        )
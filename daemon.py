@@ -0,0 +1,201 @@
+import json
+import logging
+import queue
+import signal
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+# How much of the time left before the next deadline to wait between cycles
+DEADLINE_FRACTION = 1 / 12
+
+
+def poll_interval(due_dates: List[datetime], now: datetime, min_interval: float, max_interval: float) -> float:
+    """Seconds until the next cycle: a fraction of the time left before the next deadline, within bounds"""
+    upcoming = [due for due in due_dates if due > now]
+    if not upcoming:
+        return max_interval
+    seconds_left = (min(upcoming) - now).total_seconds()
+    return max(min_interval, min(max_interval, seconds_left * DEADLINE_FRACTION))
+
+
+class SyncDaemon:
+    """Runs sync cycles on one long-lived CanvasNotionSync until stopped.
+
+    Connection pools, the Canvas cache and the Notion index stay warm
+    between cycles. The wait between cycles tightens as the next deadline
+    seen in the last cycle approaches. SIGTERM or SIGINT stops the loop
+    once the current cycle finishes. With ``trigger_port`` set, a local
+    HTTP endpoint accepts ``POST /sync`` for an immediate full cycle,
+    ``POST /sync?course=ID`` for one course, and ``GET /status``.
+    """
+
+    def __init__(self, syncer, cycle: Callable[[], None], min_interval: float = 120.0,
+                 max_interval: float = 3600.0, trigger_port: Optional[int] = None):
+        self.syncer = syncer
+        self.cycle = cycle
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.trigger_port = trigger_port
+        self.logger = logging.getLogger(__name__)
+
+        self.cycles = 0
+        self.due_dates: List[datetime] = []
+        self.next_cycle_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._triggers: queue.Queue = queue.Queue()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def trigger_url(self) -> Optional[str]:
+        if self._server is None:
+            return None
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def run(self) -> None:
+        """Cycle until stop() or a termination signal"""
+        self._install_signal_handlers()
+        if self.trigger_port is not None:
+            self._start_trigger_server()
+        try:
+            courses: List[Optional[int]] = [None]
+            while not self._stop.is_set():
+                interval = self._run_cycle(courses)
+                self.next_cycle_at = time.monotonic() + interval
+                self.logger.info(f"Next sync in {interval:.0f}s")
+
+                self._wake.wait(interval)
+                self._wake.clear()
+                courses = self._drain_triggers() or [None]
+        finally:
+            self._stop_trigger_server()
+        self.logger.info("Sync daemon stopped")
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def trigger(self, course_id: Optional[int] = None) -> None:
+        """Run a cycle now, for one course or, with no course, everything"""
+        self._triggers.put(course_id)
+        self._wake.set()
+
+    def _drain_triggers(self) -> List[Optional[int]]:
+        requested = []
+        while True:
+            try:
+                requested.append(self._triggers.get_nowait())
+            except queue.Empty:
+                break
+        # A full cycle covers every course anyway
+        if None in requested:
+            return [None]
+        return list(dict.fromkeys(requested))
+
+    def _run_cycle(self, courses: List[Optional[int]]) -> float:
+        """Run the requested syncs and return how long to wait before the next one"""
+        for course_id in courses:
+            if self._stop.is_set():
+                break
+            try:
+                if course_id is None:
+                    self.cycle()
+                else:
+                    self.syncer.sync_course(course_id)
+                self.last_error = None
+                self._update_due_dates(full=course_id is None)
+            except Exception as e:
+                # Keep the daemon alive; the next cycle comes round soon and retries
+                self.logger.error(f"Sync cycle failed: {str(e)}")
+                self.last_error = str(e)
+                self.cycles += 1
+                return self.min_interval
+            self.cycles += 1
+
+        return poll_interval(self.due_dates, datetime.now(timezone.utc), self.min_interval, self.max_interval)
+
+    def _update_due_dates(self, full: bool) -> None:
+        """Take the deadlines the last sync saw"""
+        # A cycle the probe skipped sees no assignments; keep the deadlines from the last one that did
+        if not self.syncer.due_dates:
+            return
+        if full:
+            self.due_dates = list(self.syncer.due_dates)
+        else:
+            # One course's deadlines; every other course's still count
+            self.due_dates = sorted(set(self.due_dates) | set(self.syncer.due_dates))
+
+    def _install_signal_handlers(self) -> None:
+        if threading.current_thread() is not threading.main_thread():
+            return
+
+        def handle(signum, frame):
+            self.logger.info(f"Received signal {signum}, stopping after the current cycle")
+            self.stop()
+
+        signal.signal(signal.SIGTERM, handle)
+        signal.signal(signal.SIGINT, handle)
+
+    def status(self) -> Dict:
+        next_in = None
+        if self.next_cycle_at is not None:
+            next_in = max(0.0, round(self.next_cycle_at - time.monotonic(), 1))
+        return {
+            "cycles": self.cycles,
+            "next_cycle_in": next_in,
+            "last_error": self.last_error,
+            "stats": dict(self.syncer.stats)
+        }
+
+    def _start_trigger_server(self) -> None:
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                daemon.logger.debug(f"Trigger request: {format % args}")
+
+            def _reply(self, status: int, payload: Dict) -> None:
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if urlparse(self.path).path == "/status":
+                    self._reply(200, daemon.status())
+                else:
+                    self._reply(404, {"error": "not found"})
+
+            def do_POST(self):
+                parsed = urlparse(self.path)
+                if parsed.path != "/sync":
+                    self._reply(404, {"error": "not found"})
+                    return
+                course = parse_qs(parsed.query).get("course", [None])[0]
+                try:
+                    course_id = int(course) if course is not None else None
+                except ValueError:
+                    self._reply(400, {"error": f"invalid course id: {course}"})
+                    return
+                daemon.trigger(course_id)
+                self._reply(202, {"queued": "all" if course_id is None else course_id})
+
+        # Local only: the endpoint has no authentication
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.trigger_port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, args=(0.2,), name="trigger", daemon=True).start()
+        self.logger.info(f"Listening for sync triggers on {self.trigger_url}")
+
+    def _stop_trigger_server(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
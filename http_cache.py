@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Response headers worth replaying from the cache (Link drives Canvas pagination)
+CACHED_HEADERS = ('Content-Type', 'Link', 'ETag', 'Last-Modified')
+
+
+class HttpCache:
+    """Size-bounded on-disk cache of GET responses with conditional revalidation.
+
+    Entries younger than ``ttl`` seconds are served without a request.
+    Older entries are revalidated with If-None-Match/If-Modified-Since, and
+    a 304 counts as a hit. When the cache grows past ``max_bytes`` the least
+    recently used entries are evicted; file mtimes carry the LRU order
+    across runs.
+    """
+
+    def __init__(self, directory: str, ttl: float = 0, max_bytes: int = 50 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self.reset_stats()
+
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.name.endswith('.json'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[:-5], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+            self._total_bytes += size
+
+    def reset_stats(self) -> None:
+        """Zero the hit/miss counters at the start of a run"""
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.bytes_saved = 0
+
+    def key(self, url: str, params: Optional[Dict], headers: Dict) -> str:
+        """Cache key for a request; the Authorization header keeps accounts apart"""
+        parts = [url, json.dumps(params or {}, sort_keys=True), headers.get('Authorization', '')]
+        return hashlib.sha256("\n".join(parts).encode('utf-8')).hexdigest()
+
+    def fetch(self, send: Callable[[Dict], requests.Response], url: str,
+              params: Optional[Dict], headers: Dict) -> requests.Response:
+        """Serve a GET from the cache, revalidating or calling send(extra_headers) as needed"""
+        key = self.key(url, params, headers)
+        entry = self._read(key)
+
+        if entry and time.time() - entry['stored_at'] < self.ttl:
+            self._record_hit(entry)
+            return self._to_response(entry)
+
+        conditional = {}
+        if entry and entry['headers'].get('ETag'):
+            conditional['If-None-Match'] = entry['headers']['ETag']
+        if entry and entry['headers'].get('Last-Modified'):
+            conditional['If-Modified-Since'] = entry['headers']['Last-Modified']
+
+        response = send(conditional)
+
+        if response.status_code == 304 and entry:
+            entry['stored_at'] = time.time()
+            for name in ('ETag', 'Last-Modified'):
+                if response.headers.get(name):
+                    entry['headers'][name] = response.headers[name]
+            self._write(key, entry)
+            with self._lock:
+                self.revalidated += 1
+            self._record_hit(entry)
+            return self._to_response(entry)
+
+        with self._lock:
+            self.misses += 1
+
+        # Without validators or a TTL an entry could never be reused
+        cacheable = response.status_code == 200 and (
+            self.ttl > 0 or 'ETag' in response.headers or 'Last-Modified' in response.headers
+        )
+        if cacheable:
+            self._write(key, {
+                'url': response.url or url,
+                'stored_at': time.time(),
+                'headers': {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers},
+                'body': response.text
+            })
+        return response
+
+    def _record_hit(self, entry: Dict) -> None:
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += len(entry['body'])
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _read(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            if key not in self._sizes:
+                return None
+            self._sizes.move_to_end(key)
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(self._path(key))
+            return entry
+        except (OSError, ValueError):
+            # Missing or unreadable entries are simply treated as misses
+            self._discard(key)
+            return None
+
+    def _write(self, key: str, entry: Dict) -> None:
+        data = json.dumps(entry).encode('utf-8')
+        tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+
+        with self._lock:
+            self._total_bytes += len(data) - self._sizes.get(key, 0)
+            self._sizes[key] = len(data)
+            self._sizes.move_to_end(key)
+            evicted = []
+            while self._total_bytes > self.max_bytes and len(self._sizes) > 1:
+                old_key, size = self._sizes.popitem(last=False)
+                self._total_bytes -= size
+                evicted.append(old_key)
+        for old_key in evicted:
+            self._remove_file(old_key)
+
+    def _discard(self, key: str) -> None:
+        with self._lock:
+            self._total_bytes -= self._sizes.pop(key, 0)
+        self._remove_file(key)
+
+    def _remove_file(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _to_response(entry: Dict) -> requests.Response:
+        """Rebuild a requests.Response from a cache entry"""
+        response = requests.Response()
+        response.status_code = 200
+        response.url = entry['url']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response._content = entry['body'].encode('utf-8')
+        response.encoding = 'utf-8'
+        return response
@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Set
+
+
+class ResumeState(NamedTuple):
+    """What an interrupted run had finished, read back from its journal"""
+    courses: Set[int]
+    pages: Dict[int, str]
+    in_flight: Dict[int, Dict]
+
+
+class SyncJournal:
+    """Append-only checkpoint log of a sync run.
+
+    Each line is a JSON event: "course" when every assignment in a course
+    has been written, "create" just before a page create is sent and
+    "done" with the page id once an assignment is written. A run that
+    finishes clears the journal; one that dies leaves it behind, and the
+    next run reads it back to skip finished work and to reconcile creates
+    that were sent but never recorded. A torn last line from a crash is
+    ignored.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def load(self) -> ResumeState:
+        """Read what an interrupted run left behind"""
+        courses: Set[int] = set()
+        pages: Dict[int, str] = {}
+        in_flight: Dict[int, Dict] = {}
+        for event in self._read_events():
+            kind = event.get("event")
+            if kind == "course":
+                courses.add(event["course_id"])
+            elif kind == "create":
+                in_flight[event["assignment_id"]] = event
+            elif kind == "done":
+                pages[event["assignment_id"]] = event["page_id"]
+                in_flight.pop(event["assignment_id"], None)
+        return ResumeState(courses, pages, in_flight)
+
+    def _read_events(self) -> List[Dict]:
+        if not os.path.exists(self.path):
+            return []
+        events = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue
+        return events
+
+    def open(self, resume: Optional[ResumeState] = None) -> None:
+        """Start journaling a run, carrying over what a previous attempt finished"""
+        self.compact(resume or ResumeState(set(), {}, {}))
+        with self._lock:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._append({"event": "run", "started": datetime.now(timezone.utc).isoformat()})
+
+    def compact(self, resume: ResumeState) -> None:
+        """Rewrite the journal as one line per finished course and assignment and per unresolved create"""
+        events = [{"event": "course", "course_id": course_id} for course_id in sorted(resume.courses)]
+        events += [{"event": "done", "assignment_id": assignment_id, "page_id": page_id}
+                   for assignment_id, page_id in resume.pages.items()]
+        # Kept until a "done" resolves them, in case this run dies before reconciling them too
+        events += [{**event, "event": "create"} for assignment_id, event in resume.in_flight.items()
+                   if assignment_id not in resume.pages]
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def course_done(self, course_id: int) -> None:
+        self._append({"event": "course", "course_id": course_id})
+
+    def create_started(self, assignment_id: int, name: str, course: str) -> None:
+        self._append({"event": "create", "assignment_id": assignment_id, "name": name, "course": course})
+
+    def assignment_done(self, assignment_id: int, page_id: str) -> None:
+        self._append({"event": "done", "assignment_id": assignment_id, "page_id": page_id})
+
+    def _append(self, event: Dict) -> None:
+        with self._lock:
+            if self._file is None:
+                return
+            # Flushed per line so a crash loses at most the event being written
+            self._file.write(json.dumps(event) + "\n")
+            self._file.flush()
+
+    def complete(self) -> None:
+        """The run finished, so nothing needs resuming: empty the journal"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def close(self) -> None:
+        """Stop journaling, leaving the file for the next run to resume from"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
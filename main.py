@@ -1,28 +1,126 @@
 import os
+import argparse
+import json
+import threading
+import time
+import uuid
 import requests
 import logging
-from datetime import datetime
-from typing import Dict, List, Optional
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 from dotenv import load_dotenv
+from batch import load_accounts, run_batch
+from canvas_graphql import CanvasGraphQL
+from daemon import SyncDaemon
+from http_cache import HttpCache
+from journal import ResumeState, SyncJournal
+from metrics import RunProfiler, SyncMetrics
+from notion_index import NotionIndex
+from pipeline import SyncPipeline
+from plan import Change, SyncPlan
+from records import Assignment, Course, SyncRecord, parse_timestamp, points_value, submission_status
+from rate_limit import RequestScheduler
+from sync_logging import configure_logging, log_context, set_run_id
+from sync_state import SyncStateStore, property_hash
+from transport import DEFAULT_TIMEOUT, HttpTransport
+
+# Canvas caps per_page at 100 on most list endpoints
+CANVAS_PAGE_SIZE = 100
+
+# --assignment-logs choices: level for the per-assignment lines, or None to drop them
+ASSIGNMENT_LOG_LEVELS = {"info": logging.INFO, "debug": logging.DEBUG, "off": None}
+
+# Planner item types that are backed by a Canvas assignment
+PLANNER_ASSIGNMENT_TYPES = ("assignment", "quiz", "discussion_topic")
+
+# Hours after which a run syncs everything even if the change probe sees nothing new
+FULL_SWEEP_HOURS = 24
+
+# Transforming is cheap CPU work, so a couple of threads keep up with both APIs
+TRANSFORM_WORKERS = 2
 
 class CanvasNotionSync:
-    def __init__(self, canvas_api_key: str, canvas_domain: str, notion_api_key: str, notion_database_id: str):
-        # Set up logging
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('sync_log.txt'),
-                logging.StreamHandler()
-            ]
-        )
+    def __init__(self, canvas_api_key: str, canvas_domain: str, notion_api_key: str, notion_database_id: str,
+                 concurrent: bool = True, canvas_concurrency: int = 4, notion_concurrency: int = 3,
+                 state_path: Optional[str] = None, cache: Optional[HttpCache] = None,
+                 canvas_rate: float = 10.0, notion_rate: float = 3.0, max_retries: int = 5,
+                 timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+                 metrics_json: Optional[str] = None, metrics_prom: Optional[str] = None,
+                 profile_path: Optional[str] = None, queue_size: int = 100,
+                 journal_path: Optional[str] = None, canvas_graphql: bool = False,
+                 assignment_logs: str = "info", archive_orphans: bool = False):
+        # Set up logging, unless the application already has
+        configure_logging()
         self.logger = logging.getLogger(__name__)
+        # Per-assignment lines dominate a large sync's log, so they can be demoted or dropped
+        self.assignment_log_level = ASSIGNMENT_LOG_LEVELS[assignment_logs]
+        self.run_id: Optional[str] = None
         
         self.canvas_api_key = canvas_api_key
         canvas_domain = canvas_domain.rstrip('/')
-        self.canvas_base_url = f"https://{canvas_domain}/api/v1"
+        self.canvas_web_url = f"https://{canvas_domain}"
+        self.canvas_base_url = f"{self.canvas_web_url}/api/v1"
+        self.notion_base_url = "https://api.notion.com/v1"
         self.notion_api_key = notion_api_key
         self.notion_database_id = notion_database_id
+
+        # Concurrency settings: each API gets its own limit on in-flight requests
+        self.concurrent = concurrent
+        self.canvas_concurrency = max(1, canvas_concurrency)
+        self.notion_concurrency = max(1, notion_concurrency)
+        # Bound on each pipeline queue between fetch, transform and write
+        self.queue_size = max(1, queue_size)
+
+        # Every outbound request goes through its API's scheduler for rate limiting and retries
+        self.canvas_scheduler = RequestScheduler(
+            "Canvas", canvas_rate, max_retries=max_retries, remaining_header="X-Rate-Limit-Remaining"
+        )
+        self.notion_scheduler = RequestScheduler("Notion", notion_rate, max_retries=max_retries)
+
+        # Existing Notion pages, loaded once per run by load_notion_index. A long-running
+        # process can keep the index between runs for up to index_max_age seconds.
+        self.page_index: Optional[NotionIndex] = None
+        self._schema_checked = False
+        self.index_max_age: Optional[float] = None
+        self._index_loaded_at: Optional[float] = None
+
+        # Local record of previous runs, used to skip assignments that haven't moved
+        self.state: Optional[SyncStateStore] = SyncStateStore(state_path) if state_path else None
+
+        # When the last applied plan was made, so an older saved plan can't undo newer changes
+        self._last_plan_created_at: Optional[str] = None
+
+        # Checkpoint journal so an interrupted sync can pick up where it stopped
+        self.journal: Optional[SyncJournal] = SyncJournal(journal_path) if journal_path else None
+        self.resume: Optional[ResumeState] = None
+
+        # Fetch Canvas data through GraphQL, falling back to REST on any error
+        self.canvas_graphql = canvas_graphql
+        # Assignments by course id, when GraphQL fetched them along with the courses
+        self._prefetched_assignments: Optional[Dict[int, List[Assignment]]] = None
+
+        # Optional conditional-request cache for Canvas GETs
+        self.canvas_cache = cache
+
+        # Archive pages whose Canvas assignment was deleted, at the end of a full sync
+        self.archive_orphans = archive_orphans
+
+        # Per-run counts of what happened to each assignment, and the due dates and Canvas ids seen
+        self.stats: Dict[str, int] = {}
+        self.due_dates: List[datetime] = []
+        self.canvas_ids: Set[int] = set()
+        self._stats_lock = threading.Lock()
+        # Queue depths and per-stage throughput from the last pipelined run
+        self.pipeline_stats: Dict[str, float] = {}
+
+        # Per-run API call and phase instrumentation, exported at the end of each run
+        self.metrics = SyncMetrics()
+        self.metrics_json = metrics_json
+        self.metrics_prom = metrics_prom
+        self.profile_path = profile_path
+        self.profiler: Optional[RunProfiler] = None
         
         # Headers for API requests
         self.canvas_headers = {
@@ -34,96 +132,291 @@ class CanvasNotionSync:
             "Notion-Version": "2022-06-28"
         }
 
-    def get_canvas_courses(self) -> List[Dict]:
+        # One pooled keep-alive transport per service, sized to its concurrency
+        self.canvas = HttpTransport(
+            self.canvas_headers, pool_size=self.canvas_concurrency, timeout=timeout,
+            scheduler=self.canvas_scheduler, cache=cache, metrics=self.metrics, name="canvas"
+        )
+        self.notion = HttpTransport(
+            self.notion_headers, pool_size=self.notion_concurrency, timeout=timeout,
+            scheduler=self.notion_scheduler, metrics=self.metrics, name="notion"
+        )
+
+    def close(self) -> None:
+        """Release pooled connections and the state store"""
+        self.canvas.close()
+        self.notion.close()
+        if self.journal is not None:
+            self.journal.close()
+        if self.state is not None:
+            self.state.close()
+
+    def canvas_get(self, url: str, params: Optional[Dict] = None) -> requests.Response:
+        """GET from Canvas through the pooled, cached transport"""
+        return self.canvas.get(url, params)
+
+    def notion_request(self, method: str, path: str, payload: Dict, idempotent: bool = True) -> requests.Response:
+        """Send a request to the Notion API through the pooled transport"""
+        return self.notion.request(method, f"{self.notion_base_url}/{path}", idempotent=idempotent, json=payload)
+
+    def iter_canvas_list(self, url: str, params: Optional[Dict] = None, phase: str = "canvas_list") -> Iterator[Dict]:
+        """Yield items from a Canvas list endpoint, following Link rel="next" pages as they arrive"""
+        params = dict(params or {})
+        params.setdefault("per_page", CANVAS_PAGE_SIZE)
+
+        while url:
+            with self.metrics.phase(phase):
+                response = self.canvas_get(url, params)
+                response.raise_for_status()
+
+            yield from response.json()
+
+            # The next link already carries the query string, including per_page
+            url = response.links.get('next', {}).get('url')
+            params = None
+
+    @staticmethod
+    def is_current_course(course: Course) -> bool:
+        """Whether a course belongs to the semester being synced"""
+        return bool('2025' in course.term and
+                    'Spring' in course.term and
+                    not course.name.startswith('ROLLA-NONCREDIT'))
+
+    def get_canvas_courses(self, prefetch_assignments: bool = True) -> List[Course]:
         """Fetch current semester active courses from Canvas"""
+        self._prefetched_assignments = None
+        if self.canvas_graphql and prefetch_assignments:
+            courses = self._fetch_graphql()
+            if courses is not None:
+                return courses
+
         base_url = self.canvas_base_url.rstrip('/')
-        
-        response = requests.get(
+        courses = self.iter_canvas_list(
             f"{base_url}/courses",
-            headers=self.canvas_headers,
             params={
                 "enrollment_state": "active",
                 "include": "term",
                 "enrollment_type": "student"
-            }
+            },
+            phase="canvas_courses"
         )
-        response.raise_for_status()
-        courses = response.json()
         
-        current_courses = []
-        for course in courses:
-            if (course.get('term') and 
-                '2025' in course['term'].get('name', '') and 
-                'Spring' in course['term'].get('name', '') and
-                not course['name'].startswith('ROLLA-NONCREDIT')):
-                current_courses.append(course)
-            
-        return current_courses
+        # Courses outside their access dates come back as just an id, with no name or term
+        courses = (Course.from_canvas(course) for course in courses if not course.get('access_restricted_by_date'))
+        return [course for course in courses if self.is_current_course(course)]
+
+    def _fetch_graphql(self) -> Optional[List[Course]]:
+        """Fetch current courses and all their assignments through GraphQL, or None to use REST"""
+        graphql_url = self.canvas_base_url.rstrip('/').rsplit('/v1', 1)[0] + "/graphql"
+        client = CanvasGraphQL(self.canvas, graphql_url, page_size=CANVAS_PAGE_SIZE)
+        try:
+            with self.metrics.phase("canvas_courses"):
+                courses = [course for course in client.courses() if self.is_current_course(course)]
+            with self.metrics.phase("canvas_assignments"):
+                self._prefetched_assignments = client.assignments([course.id for course in courses])
+            return courses
+        except Exception as e:
+            self.logger.warning(f"Canvas GraphQL fetch failed, falling back to REST: {str(e)}")
+            self._prefetched_assignments = None
+            return None
 
-    def get_course_assignments(self, course_id: int) -> List[Dict]:
-        """Fetch assignments for a specific course"""
-        response = requests.get(
+    def iter_course_assignments(self, course_id: int) -> Iterator[Assignment]:
+        """Stream assignments for a specific course, including the user's submission for each"""
+        if self._prefetched_assignments is not None and course_id in self._prefetched_assignments:
+            return iter(self._prefetched_assignments[course_id])
+        return map(Assignment.from_canvas, self.iter_canvas_list(
             f"{self.canvas_base_url}/courses/{course_id}/assignments",
-            headers=self.canvas_headers
+            params={"include[]": "submission"},
+            phase="canvas_assignments"
+        ))
+
+    def get_planner_assignments(self, start: datetime, end: datetime,
+                                courses: List[Course]) -> Dict[int, List[Assignment]]:
+        """Fetch assignments due in a date window across all courses from the planner, keyed by course id"""
+        course_ids = {course.id for course in courses}
+        assignments: Dict[int, List[Assignment]] = {}
+        items = self.iter_canvas_list(
+            f"{self.canvas_base_url}/planner/items",
+            params={
+                "start_date": start.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "end_date": end.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+            },
+            phase="canvas_planner"
         )
-        response.raise_for_status()
-        return response.json()
+        linked: Dict[int, List[int]] = {}
+        for item in items:
+            if item.get('course_id') not in course_ids:
+                continue
+            assignment = self.assignment_from_planner_item(item)
+            if assignment is not None:
+                assignments.setdefault(item['course_id'], []).append(assignment)
+            elif item.get('plannable_type') in PLANNER_ASSIGNMENT_TYPES:
+                # Quizzes and graded discussions point at their assignment; ungraded discussions have none
+                assignment_id = (item.get('plannable') or {}).get('assignment_id')
+                if assignment_id is not None:
+                    linked.setdefault(item['course_id'], []).append(assignment_id)
+
+        # Their plannable is the quiz or topic, whose dates, points and URL aren't the assignment's,
+        # so read the assignments themselves, one request per course
+        for course_id, assignment_ids in linked.items():
+            records = self.iter_canvas_list(
+                f"{self.canvas_base_url}/courses/{course_id}/assignments",
+                params={"include[]": "submission", "assignment_ids[]": assignment_ids},
+                phase="canvas_planner"
+            )
+            assignments.setdefault(course_id, []).extend(map(Assignment.from_canvas, records))
+        return assignments
+
+    def assignment_from_planner_item(self, item: Dict) -> Optional[Assignment]:
+        """Turn a planner item for an assignment into an assignment record, matching what REST returns"""
+        if item.get('plannable_type') != "assignment":
+            return None
+        plannable = item.get('plannable') or {}
+        assignment_id = item.get('plannable_id')
+        if assignment_id is None:
+            return None
+
+        # Planner items only report the submission's state
+        submissions = item.get('submissions') or {}
+        if submissions.get('graded') and submissions.get('submitted'):
+            status = "Graded"
+        elif submissions.get('submitted'):
+            status = "Submitted"
+        else:
+            status = "Not Submitted"
+
+        return Assignment(
+            assignment_id,
+            plannable.get('title', ''),
+            parse_timestamp(item.get('plannable_date') or plannable.get('due_at')),
+            points_value(plannable.get('points_possible')),
+            # The URL the REST API gives, so a window run and a full sync build the same properties
+            f"{self.canvas_web_url}/courses/{item['course_id']}/assignments/{assignment_id}",
+            plannable.get('updated_at'),
+            status
+        )
+
+    def get_course_assignments(self, course_id: int) -> List[Assignment]:
+        """Fetch all assignments for a specific course"""
+        return list(self.iter_course_assignments(course_id))
+
+    @staticmethod
+    def status_from_submission(submission: Dict) -> str:
+        """Map a Canvas submission object to our submission status values"""
+        return submission_status(submission)
 
     def get_submission_status(self, course_id: int, assignment_id: int) -> str:
         """Get the submission status for an assignment"""
-        response = requests.get(
-            f"{self.canvas_base_url}/courses/{course_id}/assignments/{assignment_id}/submissions/self",
-            headers=self.canvas_headers
-        )
+        with self.metrics.phase("submission_lookup"):
+            response = self.canvas_get(
+                f"{self.canvas_base_url}/courses/{course_id}/assignments/{assignment_id}/submissions/self"
+            )
         if response.ok:
-            submission = response.json()
-            if submission.get('submitted_at'):
-                if submission.get('graded_at'):
-                    return "Graded"
-                return "Submitted"
-            return "Not Submitted"
+            return self.status_from_submission(response.json())
         return "Unknown"
 
-    def find_existing_page(self, assignment_name: str, course_name: str) -> Optional[str]:
-        """Find existing Notion page for an assignment"""
-        query = {
-            "filter": {
-                "and": [
-                    {
-                        "property": "Name",
-                        "title": {
-                            "equals": assignment_name
-                        }
-                    },
-                    {
-                        "property": "Course",
-                        "rich_text": {
-                            "equals": course_name
-                        }
+    def assignment_submission_status(self, assignment: Assignment, course_id: int) -> str:
+        """Use the submission embedded in the assignment, falling back to a per-assignment request"""
+        if assignment.submission_status is not None:
+            return assignment.submission_status
+        return self.get_submission_status(course_id, assignment.id)
+
+    def find_existing_page(self, assignment_name: str, course_name: str,
+                           assignment_id: Optional[int] = None) -> Optional[str]:
+        """Find existing Notion page for an assignment, by Canvas ID or else by name and course"""
+        name_filter = {
+            "and": [
+                {
+                    "property": "Name",
+                    "title": {
+                        "equals": assignment_name
+                    }
+                },
+                {
+                    "property": "Course",
+                    "rich_text": {
+                        "equals": course_name
                     }
-                ]
-            }
+                }
+            ]
         }
+        query = {"filter": name_filter}
+        if assignment_id is not None:
+            # One query covers both, so a renamed assignment still finds its page
+            query = {"filter": {"or": [{"property": "Canvas ID", "number": {"equals": assignment_id}}, name_filter]}}
 
-        response = requests.post(
-            f"https://api.notion.com/v1/databases/{self.notion_database_id}/query",
-            headers=self.notion_headers,
-            json=query
-        )
+        with self.metrics.phase("notion_query"):
+            response = self.notion_request("POST", f"databases/{self.notion_database_id}/query", query)
         
         if response.ok:
             results = response.json().get('results', [])
-            if results:
-                return results[0]['id']
+            canvas_ids = [page.get('properties', {}).get('Canvas ID', {}).get('number') for page in results]
+            for page, canvas_id in zip(results, canvas_ids):
+                if canvas_id == assignment_id:
+                    return page['id']
+            # A name match with another Canvas ID is a different assignment of the same name
+            for page, canvas_id in zip(results, canvas_ids):
+                if canvas_id is None:
+                    return page['id']
         return None
 
+    def load_notion_index(self) -> NotionIndex:
+        """Read every page in the Notion database into an in-memory index"""
+        index = NotionIndex()
+        query = {"page_size": 100}
+
+        while True:
+            with self.metrics.phase("notion_index"):
+                response = self.notion_request("POST", f"databases/{self.notion_database_id}/query", query)
+                response.raise_for_status()
+            data = response.json()
+
+            for page in data.get('results', []):
+                index.add_page(page)
+
+            if not data.get('has_more') or not data.get('next_cursor'):
+                break
+            query["start_cursor"] = data['next_cursor']
+
+        return index
+
+    def ensure_database_schema(self) -> None:
+        """Make sure the database has the "Canvas ID" number property every page is written with, adding it if not"""
+        if self._schema_checked:
+            return
+        with self.metrics.phase("notion_schema"):
+            response = self.notion_request("GET", f"databases/{self.notion_database_id}", None)
+            response.raise_for_status()
+            prop = response.json().get('properties', {}).get("Canvas ID")
+            if prop is None:
+                # Databases set up before pages were matched on Canvas ID don't have it
+                self.logger.info('Adding the "Canvas ID" number property to the Notion database')
+                response = self.notion_request("PATCH", f"databases/{self.notion_database_id}",
+                                               {"properties": {"Canvas ID": {"number": {}}}})
+                if not response.ok:
+                    raise RuntimeError(
+                        f'The Notion database has no "Canvas ID" property and it could not be added '
+                        f'({response.status_code}: {response.text}). Add a number property named "Canvas ID".'
+                    )
+            elif prop.get('type') != 'number':
+                raise RuntimeError(f'The Notion database\'s "Canvas ID" property is a {prop.get("type")} '
+                                   f'property; it must be a number')
+        self._schema_checked = True
+
+    def lookup_page(self, assignment_name: str, course_name: str, assignment_id: Optional[int] = None) -> Optional[str]:
+        """Find the page for an assignment, using the preloaded index or local state when available"""
+        if self.page_index is not None:
+            return self.page_index.find(assignment_name, course_name, assignment_id)
+        if self.state is not None and assignment_id is not None:
+            saved = self.state.get(assignment_id)
+            if saved:
+                return saved.page_id
+        return self.find_existing_page(assignment_name, course_name, assignment_id)
+
     def update_page(self, page_id: str, properties: Dict) -> None:
         """Update an existing Notion page"""
-        response = requests.patch(
-            f"https://api.notion.com/v1/pages/{page_id}",
-            headers=self.notion_headers,
-            json={"properties": properties}
-        )
+        with self.metrics.phase("notion_write"):
+            response = self.notion_request("PATCH", f"pages/{page_id}", {"properties": properties})
         
         if not response.ok:
             self.logger.error(f"Error updating Notion page:")
@@ -132,18 +425,16 @@ class CanvasNotionSync:
         
         response.raise_for_status()
 
-    def create_page(self, properties: Dict) -> None:
-        """Create a new Notion page"""
+    def create_page(self, properties: Dict) -> str:
+        """Create a new Notion page and return its id"""
         data = {
             "parent": {"database_id": self.notion_database_id},
             "properties": properties
         }
 
-        response = requests.post(
-            "https://api.notion.com/v1/pages",
-            headers=self.notion_headers,
-            json=data
-        )
+        # A create retried after a 5xx could duplicate the page, so only 429s are retried
+        with self.metrics.phase("notion_write"):
+            response = self.notion_request("POST", "pages", data, idempotent=False)
         
         if not response.ok:
             self.logger.error(f"Error creating Notion page:")
@@ -151,108 +442,833 @@ class CanvasNotionSync:
             self.logger.error(f"Response content: {response.text}")
         
         response.raise_for_status()
+        return response.json()['id']
 
-    def process_assignment(self, assignment: Dict, course_name: str, course_id: int) -> None:
+    def archive_page(self, page_id: str) -> None:
+        """Archive a Notion page (Notion's delete, which can be undone from its trash)"""
+        with self.metrics.phase("notion_write"):
+            response = self.notion_request("PATCH", f"pages/{page_id}", {"archived": True})
+        if not response.ok:
+            self.logger.error(f"Error archiving Notion page {page_id}: {response.status_code} {response.text}")
+        response.raise_for_status()
+
+    def log_assignment(self, message: str) -> None:
+        """Log a per-assignment line at the configured level"""
+        if self.assignment_log_level is not None:
+            self.logger.log(self.assignment_log_level, message)
+
+    def record_stat(self, name: str) -> None:
+        """Increment a run statistic"""
+        with self._stats_lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def build_properties(self, assignment: Assignment, course_name: str, submission_status: str) -> Dict:
+        """Build the Notion properties for an assignment"""
+        return SyncRecord.from_assignment(assignment, course_name, submission_status).properties()
+
+    def plan_assignment(self, assignment: Assignment, course_name: str, course_id: int) -> Change:
+        """Decide what, if anything, needs to be written to Notion for an assignment"""
+        self.canvas_ids.add(assignment.id)
+        if assignment.due_at:
+            self.due_dates.append(assignment.due_at)
+        submission_status = self.assignment_submission_status(assignment, course_id)
+        properties = self.build_properties(assignment, course_name, submission_status)
+        properties_hash = property_hash(properties)
+        updated_at = assignment.updated_at
+
+        # Written by a run that was interrupted before it finished
+        if self.resume is not None and assignment.id in self.resume.pages:
+            return Change("unchanged", assignment.name, course_name, assignment.id,
+                          self.resume.pages[assignment.id], reason="journal")
+
+        def change(action: str, page_id: Optional[str] = None, props: Optional[Dict] = None, reason: str = "") -> Change:
+            return Change(action, assignment.name, course_name, assignment.id, page_id,
+                          props or {}, properties_hash, updated_at, reason)
+
+        # Skip entirely if Canvas hasn't touched the assignment and our properties match the last sync
+        if self.state is not None:
+            saved = self.state.get(assignment.id)
+            if saved and saved.property_hash == properties_hash and saved.canvas_updated_at == updated_at:
+                return change("unchanged", saved.page_id, reason="state")
+
+        # Check for existing page
+        existing_page_id = self.lookup_page(assignment.name, course_name, assignment.id)
+        if not existing_page_id:
+            return change("create", props=properties)
+
+        # Only PATCH the properties that actually differ from what Notion has
+        changes = properties
+        if self.page_index is not None:
+            changes = self.page_index.changed_properties(existing_page_id, properties)
+        if not changes:
+            return change("unchanged", existing_page_id)
+        return change("update", existing_page_id, changes, reason="renamed" if "Name" in changes else "")
+
+    def apply_change(self, change: Change) -> None:
+        """Carry out a planned create or update and record the result"""
+        if change.action == "unchanged":
+            if change.reason == "journal":
+                self.log_assignment(f"Already synced before interruption: {change.name}")
+                self.record_stat("resumed")
+                return
+            if change.reason == "state":
+                self.log_assignment(f"Skipping unchanged assignment: {change.name}")
+                self.record_stat("skipped")
+                if self.journal is not None:
+                    self.journal.assignment_done(change.assignment_id, change.page_id)
+                return
+            self.log_assignment(f"No changes for: {change.name}")
+            self.record_stat("unchanged")
+            page_id = change.page_id
+        elif change.action == "update":
+            if change.reason == "renamed":
+                self.log_assignment(f"Renaming existing page to: {change.name}")
+            else:
+                self.log_assignment(f"Updating existing page for: {change.name}")
+            self.update_page(change.page_id, change.properties)
+            if self.page_index is not None:
+                self.page_index.update_properties(change.page_id, change.properties)
+            self.record_stat("updated")
+            page_id = change.page_id
+        elif change.action == "create":
+            self.log_assignment(f"Creating new page for: {change.name}")
+            if self.journal is not None and change.assignment_id is not None:
+                self.journal.create_started(change.assignment_id, change.name, change.course)
+            page_id = self.create_page(change.properties)
+            if self.page_index is not None:
+                self.page_index.add(page_id, change.name, change.course, change.assignment_id, change.properties)
+            self.record_stat("created")
+        else:
+            return
+
+        if self.state is not None and change.assignment_id is not None:
+            self.state.record(change.assignment_id, page_id, change.properties_hash, change.canvas_updated_at)
+        if self.journal is not None and change.assignment_id is not None:
+            self.journal.assignment_done(change.assignment_id, page_id)
+
+    def process_assignment(self, assignment: Assignment, course_name: str, course_id: int) -> None:
         """Process a single assignment"""
+        with log_context(course_id=course_id, assignment_id=assignment.id):
+            try:
+                self.apply_change(self.plan_assignment(assignment, course_name, course_id))
+            except Exception as e:
+                self.logger.error(f"Error processing assignment {assignment.name}: {str(e)}")
+                raise
+
+    def sync_assignments(self, force: bool = False, full_sweep_hours: Optional[float] = FULL_SWEEP_HOURS):
+        """Main function to sync Canvas assignments to Notion.
+
+        Skips the run when the change probe shows nothing new, unless
+        ``force`` is set or the last full sync is older than
+        ``full_sweep_hours``.
+        """
+        with self._run():
+            self._open_journal()
+            may_skip = not force and self.resume is None and not self.full_sweep_due(full_sweep_hours)
+            # The probe reads what the sync would, so a run that can't skip still probes to save a fingerprint
+            probe, courses = self._probe_or_none()
+            if may_skip and self.canvas_unchanged(probe):
+                self.logger.info("No Canvas changes since the last sync, skipping")
+                if self.journal is not None:
+                    self.journal.complete()
+                return
+
+            # Get all active courses, unless the probe already has them and their assignments
+            if courses is None:
+                courses = self.get_canvas_courses()
+            self.logger.info(f"Found {len(courses)} current semester courses")
+            if self.resume is not None and self.resume.courses:
+                courses = [course for course in courses if course.id not in self.resume.courses]
+                self.logger.info(f"Resuming: {len(self.resume.courses)} courses already synced")
+
+            # One paginated pass over Notion replaces a query per assignment
+            self.ensure_database_schema()
+            self.page_index = self._index_for_run()
+            self._reconcile_in_flight()
+
+            self._run_courses(courses)
+            if self.archive_orphans:
+                self.reconcile_orphans(courses)
+            self._log_run_stats()
+
+            if self.journal is not None:
+                self.journal.complete()
+            if self.state is not None:
+                self.state.set_meta("last_full_sync", datetime.now(timezone.utc).isoformat())
+                # A failed assignment must be retried next run, so only a clean run lets the probe skip
+                if probe is not None and not self.stats.get('failed'):
+                    self.state.set_meta("probe", json.dumps(probe))
+
+    def sync_window(self, start: datetime, end: datetime, full_sweep_hours: Optional[float] = None) -> None:
+        """Sync only assignments due between start and end, running a full sync instead when one is due.
+
+        There's no change probe: the courses and one planner listing cost
+        less than the probe's read of every course's assignments.
+        """
+        if self.full_sweep_due(full_sweep_hours):
+            # The sweep catches whatever falls outside the window, so it never skips
+            self.logger.info("Full sweep due, syncing every assignment")
+            self.sync_assignments(force=True)
+            return
+
+        with self._run():
+            courses = self.get_canvas_courses(prefetch_assignments=False)
+            self._prefetched_assignments = self.get_planner_assignments(start, end, courses)
+            courses = [course for course in courses if course.id in self._prefetched_assignments]
+            count = sum(len(assignments) for assignments in self._prefetched_assignments.values())
+            self.logger.info(f"Found {count} planner assignments in {len(courses)} courses due {start:%Y-%m-%d} to {end:%Y-%m-%d}")
+
+            # With local state, unchanged items cost no Notion calls, so indexing the whole database isn't worth it
+            self.ensure_database_schema()
+            self.page_index = self._index_for_run() if self.state is None else None
+            self._run_courses(courses)
+            self._log_run_stats()
+
+    def sync_course(self, course_id: int) -> None:
+        """Sync one course right away, without the change probe or the checkpoint journal"""
+        with self._run():
+            courses = [course for course in self.get_canvas_courses(prefetch_assignments=False)
+                       if course.id == course_id]
+            if not courses:
+                self.logger.warning(f"Course {course_id} is not a current semester course")
+                return
+            self.ensure_database_schema()
+            self.page_index = self._index_for_run()
+            self._run_courses(courses)
+            self._log_run_stats()
+
+    def probe_canvas(self) -> Tuple[Dict, List[Course]]:
+        """Fingerprint Canvas from the course list and each course's assignments with the user's submissions.
+
+        Each course's entry holds its assignment count and a hash of every
+        assignment's id, updated_at and submission status, so it moves when
+        an assignment is added, removed or edited (due date, name, points)
+        and when the user submits or is graded. The assignments are kept
+        prefetched, so a run that finds changes syncs from them without
+        reading Canvas again. Returns the fingerprint and the courses.
+        """
+        with self.metrics.phase("probe"):
+            courses = self.get_canvas_courses()
+            if self._prefetched_assignments is None:
+                self._prefetched_assignments = {}
+            fingerprint = []
+            for course in courses:
+                if course.id not in self._prefetched_assignments:
+                    self._prefetched_assignments[course.id] = list(self.iter_course_assignments(course.id))
+                assignments = self._prefetched_assignments[course.id]
+                digest = property_hash({str(a.id): [a.updated_at, a.submission_status] for a in assignments})
+                fingerprint.append([course.id, course.name, len(assignments), digest])
+        return {"courses": sorted(fingerprint)}, courses
+
+    def _probe_or_none(self) -> Tuple[Optional[Dict], Optional[List[Course]]]:
+        """Probe Canvas when there's saved state to compare against; no probe means run the full sync"""
+        if self.state is None:
+            return None, None
         try:
-            # Handle due date
-            due_date = assignment.get('due_at')
-            if due_date:
-                try:
-                    parsed_date = datetime.strptime(due_date, "%Y-%m-%dT%H:%M:%SZ")
-                except ValueError:
-                    try:
-                        parsed_date = datetime.strptime(due_date.split('.')[0], "%Y-%m-%dT%H:%M:%S")
-                    except ValueError:
-                        self.logger.warning(f"Could not parse date: {due_date}")
-                        parsed_date = None
-                due_date = parsed_date.date().isoformat() if parsed_date else None
-
-            # Handle points
-            points = assignment.get('points_possible')
-            if points is None:
-                points = 0
+            return self.probe_canvas()
+        except Exception as e:
+            self.logger.warning(f"Change probe failed, running a full sync: {str(e)}")
+            self._prefetched_assignments = None
+            return None, None
+
+    def canvas_unchanged(self, probe: Optional[Dict]) -> bool:
+        """Whether a probe matches the one saved after the last clean full sync"""
+        if probe is None or self.state is None:
+            return False
+        return self.state.get_meta("probe") == json.dumps(probe)
+
+    def full_sweep_due(self, full_sweep_hours: Optional[float]) -> bool:
+        """Whether the last full sync is older than full_sweep_hours"""
+        if full_sweep_hours is None or self.state is None:
+            return False
+        last = self.state.get_meta("last_full_sync")
+        if last is None:
+            return True
+        return datetime.now(timezone.utc) - datetime.fromisoformat(last) >= timedelta(hours=full_sweep_hours)
+
+    def plan_sync(self, plan_path: Optional[str] = None) -> SyncPlan:
+        """Work out every change the sync would make without writing to Notion"""
+        with self._run("planning"):
+            plan = self.build_plan()
+            for change in plan.writes():
+                detail = f": {', '.join(change.properties)}" if change.action == "update" else ""
+                self.logger.info(f"Plan: {change.action} {change.name} ({change.course}){detail}")
+            for change in plan.by_action("orphaned"):
+                self.logger.info(f"Plan: orphaned {change.name} ({change.course})")
+            if plan_path:
+                plan.save(plan_path)
+                self.logger.info(f"Saved plan to {plan_path}")
+            return plan
+
+    def apply_plan(self, plan: Optional[SyncPlan] = None) -> None:
+        """Apply a plan, building a fresh one first if none is given"""
+        with self._run():
+            if plan is None:
+                plan = self.build_plan()
             else:
+                # A saved plan can be stale, so its creates are checked against the pages there now
+                self.page_index = self._index_for_run()
+            self.ensure_database_schema()
+            self._apply_plan(plan)
+            self._log_run_stats()
+
+    def build_plan(self) -> SyncPlan:
+        """Gather all Canvas and Notion state and turn it into a change set"""
+        plan = SyncPlan(self.notion_database_id)
+        plan_lock = threading.Lock()
+        max_workers = self.canvas_concurrency if self.concurrent else 1
+
+        with self._executor("plan", max_workers + 1) as executor:
+            # The Notion index loads while Canvas lists courses
+            index_future = executor.submit(self._load_index_or_fallback)
+            courses = self.get_canvas_courses()
+            self.logger.info(f"Found {len(courses)} current semester courses")
+            self.page_index = index_future.result()
+
+            course_futures = [executor.submit(self._plan_course, course, plan, plan_lock) for course in courses]
+            for future in as_completed(course_futures):
+                future.result()
+
+        # Pages in the synced courses whose Canvas assignment is gone
+        if self.page_index is not None:
+            for page_id, name, course_name, canvas_id in self.page_index.orphans(
+                    self.canvas_ids, (course.name for course in courses)):
+                plan.add(Change("orphaned", name, course_name, canvas_id, page_id))
+
+        counts = plan.counts()
+        self.logger.info(
+            f"Plan: {counts['create']} create, {counts['update']} update, "
+            f"{counts['unchanged']} unchanged, {counts['orphaned']} orphaned"
+        )
+        return plan
+
+    def _plan_course(self, course: Course, plan: SyncPlan, plan_lock: threading.Lock) -> None:
+        """Plan every assignment in a course"""
+        course_name = course.name
+        course_id = course.id
+        self.logger.info(f"Processing course: {course_name}")
+
+        count = 0
+        for assignment in self.iter_course_assignments(course_id):
+            count += 1
+            with log_context(course_id=course_id, assignment_id=assignment.id):
                 try:
-                    points = float(points)
-                except (ValueError, TypeError):
-                    points = 0
+                    change = self.plan_assignment(assignment, course_name, course_id)
+                except Exception as e:
+                    self.logger.error(f"Failed to plan assignment {assignment.name}: {str(e)}")
+                    self.record_stat("failed")
+                    continue
+            with plan_lock:
+                plan.add(change)
 
-            # Get submission status
-            submission_status = self.get_submission_status(course_id, assignment['id'])
+        self.logger.info(f"Found {count} assignments in {course_name}")
 
-            # Create properties
-            properties = {
-                "Name": {
-                    "title": [{"text": {"content": assignment['name']}}]
-                },
-                "Course": {
-                    "rich_text": [{"text": {"content": course_name}}]
-                },
-                "Due Date": {
-                    "date": {"start": due_date} if due_date else None
-                },
-                "Points": {
-                    "number": points
-                },
-                "Status": {
-                    "status": {
-                        "name": "Done" if submission_status in ["Graded", "Submitted"] else "Not started"
-                    }
-                },
-                "Submission Status": {
-                    "select": {
-                        "name": submission_status
-                    }
-                },
-                "Canvas URL": {
-                    "url": assignment.get('html_url', '')
-                }
-            }
+    def _apply_plan(self, plan: SyncPlan) -> None:
+        """Write a plan's creates and updates to Notion as fast as the rate limit allows"""
+        if plan.database_id != self.notion_database_id:
+            raise ValueError(f"Plan was made for database {plan.database_id}, not {self.notion_database_id}")
+        last_created_at = self.last_plan_created_at()
+        if last_created_at is not None and (datetime.fromisoformat(plan.created_at)
+                                            < datetime.fromisoformat(last_created_at)):
+            raise ValueError(f"Plan was made at {plan.created_at}, before the last applied plan "
+                             f"({last_created_at}); make a new plan")
 
-            # Check for existing page
-            existing_page_id = self.find_existing_page(assignment['name'], course_name)
+        writes = [self._recheck_create(change) if change.action == "create" else change for change in plan.writes()]
+        for change in plan.by_action("unchanged") + [change for change in writes if change.action == "unchanged"]:
+            self.apply_change(change)
 
-            if existing_page_id:
-                self.logger.info(f"Updating existing page for: {assignment['name']}")
-                self.update_page(existing_page_id, properties)
-            else:
-                self.logger.info(f"Creating new page for: {assignment['name']}")
-                self.create_page(properties)
+        with self._executor("apply") as executor:
+            futures = {executor.submit(self._apply_logged, change): change
+                       for change in writes if change.action != "unchanged"}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    change = futures[future]
+                    self.logger.error(f"Failed to {change.action} page for {change.name}: {str(e)}")
+                    self.record_stat("failed")
+
+        self._last_plan_created_at = plan.created_at
+        if self.state is not None:
+            self.state.set_meta("last_plan_created_at", plan.created_at)
+
+        orphaned = plan.by_action("orphaned")
+        if orphaned and self.archive_orphans:
+            self.archive_orphaned_pages([(change.page_id, change.name, change.course, change.assignment_id)
+                                         for change in orphaned])
+        elif orphaned:
+            self.logger.info(f"Left {len(orphaned)} orphaned pages in place")
+
+    def last_plan_created_at(self) -> Optional[str]:
+        """When the last plan applied to this database was made, from local state if there is any"""
+        if self.state is not None:
+            return self.state.get_meta("last_plan_created_at") or self._last_plan_created_at
+        return self._last_plan_created_at
+
+    def _recheck_create(self, change: Change) -> Change:
+        """Turn a planned create into an update, or nothing, when its assignment already has a page"""
+        if self.page_index is None:
+            return change
+        page_id = self.page_index.find(change.name, change.course, change.assignment_id)
+        if page_id is None:
+            return change
+        properties = self.page_index.changed_properties(page_id, change.properties)
+        if not properties:
+            return change._replace(action="unchanged", page_id=page_id, properties={})
+        return change._replace(action="update", page_id=page_id, properties=properties,
+                               reason="renamed" if "Name" in properties else "")
+
+    def reconcile_orphans(self, courses: List[Course]) -> None:
+        """Archive pages in the synced courses whose Canvas assignment no longer exists.
+
+        The Canvas ids seen this run are diffed against the preloaded page
+        index in one pass, so this costs no queries, only the archives. It
+        only runs after a clean run: a failed assignment or a course that
+        wasn't read would make live pages look orphaned.
+        """
+        if self.page_index is None:
+            self.logger.warning("No Notion page index, not archiving orphaned pages")
+            return
+        if self.stats.get('failed'):
+            self.logger.warning("Sync had failures, not archiving orphaned pages")
+            return
+        self.archive_orphaned_pages(self.page_index.orphans(self.canvas_ids, (course.name for course in courses)))
 
+    def archive_orphaned_pages(self, orphans: List[Tuple[str, str, str, Optional[int]]]) -> None:
+        """Archive (page id, name, course, Canvas id) pages through the rate-limited Notion writer"""
+        if not orphans:
+            return
+        self.logger.info(f"Archiving {len(orphans)} pages for assignments deleted from Canvas")
+
+        def archive(page_id: str, name: str, course: str, canvas_id: Optional[int]) -> None:
+            self.archive_page(page_id)
+            self.log_assignment(f"Archived page for deleted assignment: {name} ({course})")
+            if self.page_index is not None:
+                self.page_index.remove(page_id)
+            if self.state is not None and canvas_id is not None:
+                self.state.forget(canvas_id)
+            self.record_stat("archived")
+
+        with self._executor("archive") as executor:
+            futures = {executor.submit(archive, *orphan): orphan for orphan in orphans}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    self.logger.error(f"Failed to archive page for {futures[future][1]}: {str(e)}")
+                    self.record_stat("failed")
+
+    def _index_for_run(self) -> Optional[NotionIndex]:
+        """The page index kept from an earlier run if it's recent enough, otherwise a freshly loaded one"""
+        if (self.page_index is not None and self.index_max_age is not None and self._index_loaded_at is not None
+                and time.monotonic() - self._index_loaded_at < self.index_max_age):
+            return self.page_index
+        index = self._load_index_or_fallback()
+        self._index_loaded_at = time.monotonic() if index is not None else None
+        return index
+
+    def _open_journal(self) -> None:
+        """Start the checkpoint journal, picking up an interrupted run's progress if there is one"""
+        if self.journal is None:
+            return
+        resume = self.journal.load()
+        if resume.courses or resume.pages or resume.in_flight:
+            self.resume = resume
+            self.logger.info(
+                f"Resuming interrupted sync: {len(resume.courses)} courses and "
+                f"{len(resume.pages)} assignments already done, {len(resume.in_flight)} creates in flight"
+            )
+        self.journal.open(resume)
+
+    def _reconcile_in_flight(self) -> None:
+        """Find pages for creates that were sent but never recorded, so they aren't created twice"""
+        if self.resume is None:
+            return
+        for assignment_id, event in self.resume.in_flight.items():
+            page_id = self.lookup_page(event['name'], event['course'], assignment_id)
+            if not page_id:
+                continue
+            self.logger.info(f"Found page created before interruption: {event['name']}")
+            self.resume.pages[assignment_id] = page_id
+            self.journal.assignment_done(assignment_id, page_id)
+            if self.state is not None:
+                # No hash, so the next run re-checks the page against Canvas
+                self.state.record(assignment_id, page_id, None, None)
+
+    def course_done(self, course_id: int) -> None:
+        """Checkpoint a course whose assignments were all written"""
+        if self.journal is not None:
+            self.journal.course_done(course_id)
+
+    def _apply_logged(self, change: Change) -> None:
+        with log_context(assignment_id=change.assignment_id):
+            self.apply_change(change)
+
+    def _load_index_or_fallback(self) -> Optional[NotionIndex]:
+        """Load the Notion index, or return None so lookups fall back to per-assignment queries"""
+        try:
+            index = self.load_notion_index()
+            self.logger.info(f"Indexed {len(index)} existing Notion pages")
+            return index
         except Exception as e:
-            self.logger.error(f"Error processing assignment {assignment.get('name', 'Unknown')}: {str(e)}")
-            raise
+            self.logger.warning(f"Could not index Notion database, falling back to per-assignment queries: {str(e)}")
+            return None
 
-    def sync_assignments(self):
-        """Main function to sync Canvas assignments to Notion"""
+    @contextmanager
+    def _run(self, action: str = "sync") -> Iterator[None]:
+        """Wrap one run between _begin_run and _end_run, logging any error it raises"""
+        self._begin_run()
         try:
-            # Get all active courses
-            courses = self.get_canvas_courses()
-            self.logger.info(f"Found {len(courses)} current semester courses")
-            
-            for course in courses:
-                course_name = course['name']
-                course_id = course['id']
-                self.logger.info(f"Processing course: {course_name}")
-                
-                # Get assignments for each course
-                assignments = self.get_course_assignments(course['id'])
-                self.logger.info(f"Found {len(assignments)} assignments in {course_name}")
-                
-                for assignment in assignments:
-                    try:
-                        self.process_assignment(assignment, course_name, course_id)
-                    except Exception as e:
-                        self.logger.error(f"Failed to process assignment: {str(e)}")
-                        continue
-                    
+            yield
         except Exception as e:
-            self.logger.error(f"Error during sync: {str(e)}")
+            self.logger.error(f"Error during {action}: {str(e)}")
             raise
+        finally:
+            self._end_run()
+
+    def _run_courses(self, courses: List[Course]) -> None:
+        """Sync courses through the pipeline or one at a time"""
+        if self.concurrent:
+            self._sync_concurrent(courses)
+        else:
+            self._sync_sequential(courses)
+
+    def _thread_initializer(self):
+        """Initializer that registers worker threads with the profiler, if one is running"""
+        return self.profiler.thread_initializer if self.profiler is not None else None
+
+    def _executor(self, thread_name_prefix: str, max_workers: Optional[int] = None) -> ThreadPoolExecutor:
+        """Thread pool sized to the Notion writer concurrency unless max_workers is given"""
+        if max_workers is None:
+            max_workers = self.notion_concurrency if self.concurrent else 1
+        return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix,
+                                  initializer=self._thread_initializer())
+
+    def _begin_run(self) -> None:
+        """Reset per-run stats and start profiling if requested"""
+        self.run_id = uuid.uuid4().hex[:12]
+        set_run_id(self.run_id)
+        self.stats = {}
+        self.due_dates = []
+        self.canvas_ids = set()
+        self.pipeline_stats = {}
+        self.metrics.reset()
+        self.canvas_scheduler.reset_stats()
+        self.notion_scheduler.reset_stats()
+        if self.canvas_cache is not None:
+            self.canvas_cache.reset_stats()
+        if self.profile_path:
+            self.profiler = RunProfiler()
+            self.profiler.start()
+
+    def _end_run(self) -> None:
+        """Drop per-run state, stop profiling and export the run's metrics"""
+        self.resume = None
+        self._prefetched_assignments = None
+        if self.journal is not None:
+            self.journal.close()
+        # A failure may mean the kept index is stale (e.g. a page deleted in Notion), so reload it next run
+        if self.stats.get('failed'):
+            self._index_loaded_at = None
+        if self.profiler is not None:
+            self.profiler.stop(self.profile_path)
+            self.profiler = None
+            self.logger.info(f"Wrote profile to {self.profile_path}")
+        self.export_metrics()
+        set_run_id(None)
+
+    def _log_run_stats(self) -> None:
+        self.logger.info(
+            f"Sync stats: {self.stats.get('created', 0)} created, "
+            f"{self.stats.get('updated', 0)} updated, "
+            f"{self.stats.get('unchanged', 0)} unchanged, "
+            f"{self.stats.get('skipped', 0)} skipped, "
+            f"{self.stats.get('failed', 0)} failed"
+            + (f", {self.stats['resumed']} resumed" if self.stats.get('resumed') else "")
+            + (f", {self.stats['archived']} archived" if self.stats.get('archived') else "")
+        )
+        if self.pipeline_stats:
+            p = self.pipeline_stats
+            self.logger.info(
+                f"Pipeline: fetch {p['fetch_items_per_second']:.1f}/s, "
+                f"transform {p['transform_items_per_second']:.1f}/s, "
+                f"write {p['write_items_per_second']:.1f}/s; "
+                f"queue depth max {p['assignments_queue_max_depth']}/{p['changes_queue_max_depth']}"
+            )
+        if self.canvas_cache is not None:
+            self.logger.info(
+                f"Canvas cache: {self.canvas_cache.hits} hits "
+                f"({self.canvas_cache.revalidated} revalidated), "
+                f"{self.canvas_cache.misses} misses, "
+                f"{self.canvas_cache.bytes_saved} bytes saved"
+            )
 
-def main():
+    def export_metrics(self) -> None:
+        """Finish the run's metrics and write the JSON summary and Prometheus textfile"""
+        self.metrics.finish()
+        for api, scheduler in (("canvas", self.canvas_scheduler), ("notion", self.notion_scheduler)):
+            self.metrics.set_scheduler_stats(api, scheduler.retries, scheduler.throttled_seconds)
+        self.metrics.set_extra("assignments", self.stats)
+        if self.pipeline_stats:
+            self.metrics.set_extra("pipeline", self.pipeline_stats)
+        if self.canvas_cache is not None:
+            self.metrics.set_extra("cache", {
+                "hits": self.canvas_cache.hits,
+                "misses": self.canvas_cache.misses,
+                "revalidated": self.canvas_cache.revalidated,
+                "bytes_saved": self.canvas_cache.bytes_saved
+            })
+
+        if self.metrics_json or self.metrics_prom:
+            try:
+                self.metrics.write(self.metrics_json, self.metrics_prom)
+            except OSError as e:
+                self.logger.warning(f"Could not write metrics: {str(e)}")
+
+    def rebuild_state(self, state_path: str) -> int:
+        """Recreate the local state store by matching Canvas assignments to existing Notion pages"""
+        if self.state is not None:
+            self.state.close()
+        self.state = SyncStateStore.recreate(state_path)
+        self.page_index = self.load_notion_index()
+
+        count = 0
+        for course in self.get_canvas_courses():
+            for assignment in self.iter_course_assignments(course.id):
+                page_id = self.page_index.find(assignment.name, course.name, assignment.id)
+                if page_id:
+                    # No hash or updated_at, so the next run re-checks each page against Notion
+                    self.state.record(assignment.id, page_id, None, None)
+                    count += 1
+
+        self.logger.info(f"Rebuilt sync state with {count} assignments from Notion")
+        return count
+
+    def _sync_sequential(self, courses: List[Course]) -> None:
+        """Process courses and assignments one at a time"""
+        for course in courses:
+            course_name = course.name
+            course_id = course.id
+            self.logger.info(f"Processing course: {course_name}")
+            
+            # Assignments are processed as each page of results arrives
+            count = 0
+            failed = 0
+            for assignment in self.iter_course_assignments(course_id):
+                count += 1
+                try:
+                    self.process_assignment(assignment, course_name, course_id)
+                except Exception as e:
+                    self.logger.error(f"Failed to process assignment: {str(e)}")
+                    self.record_stat("failed")
+                    failed += 1
+                    continue
+
+            self.logger.info(f"Found {count} assignments in {course_name}")
+            if not failed:
+                self.course_done(course_id)
+
+    def _sync_concurrent(self, courses: List[Course]) -> None:
+        """Run courses through the fetch -> transform -> write pipeline"""
+        pipeline = SyncPipeline(
+            self,
+            fetch_workers=self.canvas_concurrency,
+            transform_workers=TRANSFORM_WORKERS,
+            write_workers=self.notion_concurrency,
+            queue_size=self.queue_size,
+            thread_initializer=self._thread_initializer()
+        )
+        try:
+            pipeline.run(courses)
+        finally:
+            self.pipeline_stats = pipeline.stats()
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Sync Canvas assignments to a Notion database")
+    parser.add_argument("--sequential", action="store_true",
+                        help="process courses and assignments one at a time")
+    parser.add_argument("--canvas-concurrency", type=int, default=4,
+                        help="maximum in-flight Canvas requests (default: 4)")
+    parser.add_argument("--notion-concurrency", type=int, default=3,
+                        help="maximum in-flight Notion requests (default: 3)")
+    parser.add_argument("--queue-size", type=int, default=100,
+                        help="assignments buffered between pipeline stages (default: 100)")
+    parser.add_argument("--canvas-rate", type=float, default=10.0,
+                        help="Canvas requests per second (default: 10)")
+    parser.add_argument("--notion-rate", type=float, default=3.0,
+                        help="Notion requests per second (default: 3)")
+    parser.add_argument("--max-retries", type=int, default=5,
+                        help="retries for throttled or failed requests (default: 5)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT[1],
+                        help=f"read timeout in seconds for API requests (default: {DEFAULT_TIMEOUT[1]:g})")
+    parser.add_argument("--canvas-graphql", action="store_true",
+                        help="fetch courses, assignments and submissions through Canvas GraphQL, "
+                             "falling back to REST on error")
+    parser.add_argument("--window", action="store_true",
+                        help="only sync assignments due in a window around now, using the Canvas planner")
+    parser.add_argument("--days-back", type=float, default=7,
+                        help="with --window, include assignments due this many days ago (default: 7)")
+    parser.add_argument("--days-ahead", type=float, default=14,
+                        help="with --window, include assignments due this many days ahead (default: 14)")
+    parser.add_argument("--full-sweep-hours", type=float, default=FULL_SWEEP_HOURS,
+                        help="sync every assignment, even if the change probe sees nothing new or --window is "
+                             "set, when the last full sync is older than this (default: 24; needs the state file)")
+    parser.add_argument("--force", action="store_true",
+                        help="sync even if the change probe finds nothing new in Canvas")
+    parser.add_argument("--daemon", action="store_true",
+                        help="keep running, syncing on a schedule that tightens near deadlines")
+    parser.add_argument("--min-interval", type=float, default=120,
+                        help="with --daemon, shortest wait between syncs in seconds (default: 120)")
+    parser.add_argument("--max-interval", type=float, default=3600,
+                        help="with --daemon, longest wait between syncs in seconds (default: 3600)")
+    parser.add_argument("--trigger-port", type=int, metavar="PORT",
+                        help="with --daemon, accept POST /sync[?course=ID] on 127.0.0.1:PORT")
+    parser.add_argument("--index-max-age", type=float, default=3600,
+                        help="with --daemon, reload the Notion index after this many seconds (default: 3600)")
+    parser.add_argument("--batch", metavar="CONFIG",
+                        help="sync every account listed in a JSON config file instead of the one in .env")
+    parser.add_argument("--batch-workers", type=int, default=4,
+                        help="with --batch, accounts synced in parallel, one process each (default: 4)")
+    parser.add_argument("--batch-dir", default="accounts",
+                        help="with --batch, directory holding each account's state, cache and logs (default: accounts)")
+    parser.add_argument("--batch-report", default="batch_report.json",
+                        help="with --batch, where to write the per-account report (default: batch_report.json)")
+    parser.add_argument("--log-file", default="sync_log.txt",
+                        help="log file (default: sync_log.txt)")
+    parser.add_argument("--log-max-mb", type=float, default=5,
+                        help="rotate the log file at this size in MB (default: 5)")
+    parser.add_argument("--log-backups", type=int, default=5,
+                        help="rotated log files to keep (default: 5)")
+    parser.add_argument("--log-rotate-when", metavar="WHEN",
+                        help="rotate on a schedule instead of by size, e.g. 'midnight' or 'H'")
+    parser.add_argument("--log-json", action="store_true",
+                        help="write JSON lines with run, course and assignment ids")
+    parser.add_argument("--assignment-logs", choices=sorted(ASSIGNMENT_LOG_LEVELS), default="info",
+                        help="level for per-assignment log lines, or off (default: info)")
+    parser.add_argument("--verbose", action="store_true",
+                        help="log at debug level, including per-assignment lines set to debug")
+    parser.add_argument("--state-file", default="sync_state.db",
+                        help="local sync state database (default: sync_state.db)")
+    parser.add_argument("--no-state", action="store_true",
+                        help="don't read or write the local sync state")
+    parser.add_argument("--rebuild-state", action="store_true",
+                        help="rebuild the local sync state from Notion and exit")
+    parser.add_argument("--journal-file", default="sync_journal.jsonl",
+                        help="checkpoint journal for resuming an interrupted sync (default: sync_journal.jsonl)")
+    parser.add_argument("--no-journal", action="store_true",
+                        help="don't checkpoint or resume syncs")
+    parser.add_argument("--cache-dir", default=".canvas_cache",
+                        help="directory for cached Canvas responses (default: .canvas_cache)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="don't cache Canvas responses")
+    parser.add_argument("--cache-ttl", type=float, default=0,
+                        help="seconds to reuse a cached response without revalidating (default: 0)")
+    parser.add_argument("--cache-max-mb", type=float, default=50,
+                        help="maximum size of the Canvas cache in MB (default: 50)")
+    parser.add_argument("--metrics-json", default="sync_metrics.json",
+                        help="where to write the run's JSON metrics summary (default: sync_metrics.json)")
+    parser.add_argument("--metrics-prom", default="sync_metrics.prom",
+                        help="where to write the run's Prometheus textfile (default: sync_metrics.prom)")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="don't write metrics files")
+    parser.add_argument("--profile", nargs="?", const="sync_profile.prof", metavar="PATH",
+                        help="write a cProfile dump of the run (default path: sync_profile.prof)")
+    parser.add_argument("--two-phase", action="store_true",
+                        help="plan every change first, then apply the plan")
+    parser.add_argument("--plan-only", action="store_true",
+                        help="show what would change without writing to Notion")
+    parser.add_argument("--plan-file", metavar="PATH",
+                        help="with --plan-only, save the plan to PATH")
+    parser.add_argument("--apply-plan", metavar="PATH",
+                        help="apply a plan saved with --plan-only --plan-file")
+    parser.add_argument("--archive-orphans", action="store_true",
+                        help="archive pages whose Canvas assignment was deleted (full syncs and applied plans)")
+    return parser.parse_args(argv)
+
+def build_syncer(args: argparse.Namespace, canvas_api_key: str, canvas_domain: str, notion_api_key: str,
+                 notion_database_id: str, **overrides) -> CanvasNotionSync:
+    """Create a syncer configured from the command line, with per-account overrides"""
+    # A corrupt state file can't be opened, so rebuilding starts without one
+    use_state = not args.no_state and not args.rebuild_state
+    options = dict(
+        concurrent=not args.sequential,
+        canvas_concurrency=args.canvas_concurrency,
+        notion_concurrency=args.notion_concurrency,
+        queue_size=args.queue_size,
+        canvas_rate=args.canvas_rate,
+        notion_rate=args.notion_rate,
+        max_retries=args.max_retries,
+        timeout=(DEFAULT_TIMEOUT[0], args.timeout),
+        state_path=args.state_file if use_state else None,
+        journal_path=None if args.no_journal else args.journal_file,
+        canvas_graphql=args.canvas_graphql,
+        cache=None if args.no_cache else HttpCache(
+            args.cache_dir, ttl=args.cache_ttl, max_bytes=int(args.cache_max_mb * 1024 * 1024)
+        ),
+        metrics_json=None if args.no_metrics else args.metrics_json,
+        metrics_prom=None if args.no_metrics else args.metrics_prom,
+        profile_path=args.profile,
+        assignment_logs=args.assignment_logs,
+        archive_orphans=args.archive_orphans
+    )
+    options.update(overrides)
+    return CanvasNotionSync(canvas_api_key, canvas_domain, notion_api_key, notion_database_id, **options)
+
+def run_sync_mode(syncer: CanvasNotionSync, args: argparse.Namespace) -> None:
+    """Run whichever kind of sync the command line asked for"""
+    if args.rebuild_state:
+        syncer.rebuild_state(args.state_file)
+        return
+    if args.plan_only:
+        syncer.plan_sync(args.plan_file)
+        return
+    if args.apply_plan:
+        syncer.apply_plan(SyncPlan.load(args.apply_plan))
+        return
+    if args.two_phase:
+        syncer.apply_plan()
+        return
+
+    def run_sync() -> None:
+        if args.window:
+            now = datetime.now(timezone.utc)
+            syncer.sync_window(now - timedelta(days=args.days_back), now + timedelta(days=args.days_ahead),
+                               full_sweep_hours=args.full_sweep_hours)
+        else:
+            syncer.sync_assignments(force=args.force, full_sweep_hours=args.full_sweep_hours)
+
+    if args.daemon:
+        syncer.index_max_age = args.index_max_age
+        SyncDaemon(syncer, run_sync, min_interval=args.min_interval, max_interval=args.max_interval,
+                   trigger_port=args.trigger_port).run()
+    else:
+        run_sync()
+
+def configure_logging_from_args(args: argparse.Namespace, path: Optional[str] = None, console: bool = True) -> None:
+    """Set up logging from the command line options, replacing any earlier setup"""
+    configure_logging(
+        path or args.log_file,
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        json_lines=args.log_json,
+        max_bytes=int(args.log_max_mb * 1024 * 1024),
+        backup_count=args.log_backups,
+        rotate_when=args.log_rotate_when,
+        console=console,
+        force=True
+    )
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    configure_logging_from_args(args)
     try:
+        if args.batch:
+            results = run_batch(load_accounts(args.batch), args)
+            failed = [result['name'] for result in results if not result['ok']]
+            if failed:
+                raise RuntimeError(f"{len(failed)} of {len(results)} accounts failed: {', '.join(failed)}")
+            return
+
         # Load environment variables
         load_dotenv()
         canvas_api_key = os.getenv("CANVAS_API_KEY")
@@ -275,8 +1291,11 @@ def main():
         # Initialize and run sync
         logger = logging.getLogger(__name__)
         logger.info("Starting Canvas to Notion sync")
-        syncer = CanvasNotionSync(canvas_api_key, canvas_domain, notion_api_key, notion_database_id)
-        syncer.sync_assignments()
+        syncer = build_syncer(args, canvas_api_key, canvas_domain, notion_api_key, notion_database_id)
+        try:
+            run_sync_mode(syncer, args)
+        finally:
+            syncer.close()
         logger.info("Sync completed successfully")
 
     except Exception as e:
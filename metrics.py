@@ -0,0 +1,235 @@
+import bisect
+import cProfile
+import json
+import os
+import pstats
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_PREFIX = "canvas_notion_sync"
+
+# Path segments that are ids: Canvas numeric ids and Notion UUIDs
+_ID_SEGMENT = re.compile(r"^(\d+|[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}|[0-9a-fA-F]{32})$")
+
+
+def endpoint_label(url: str) -> str:
+    """Collapse ids in a URL path so calls group by endpoint"""
+    segments = urlparse(url).path.split('/')
+    return '/'.join(':id' if _ID_SEGMENT.match(segment) else segment for segment in segments)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(le, count) pairs including +Inf"""
+        running = 0
+        result = []
+        for bound, count in zip(list(self.buckets) + [float('inf')], self.counts):
+            running += count
+            result.append(("+Inf" if bound == float('inf') else f"{bound:g}", running))
+        return result
+
+    def to_dict(self) -> Dict:
+        return {"count": self.count, "sum": round(self.total, 6), "buckets": dict(self.cumulative())}
+
+
+class SyncMetrics:
+    """Thread-safe counters, latency histograms and phase timers for one sync run"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.time()
+            self.finished: Optional[float] = None
+            self.calls: Dict[Tuple[str, str, str], int] = defaultdict(int)
+            self.latency: Dict[Tuple[str, str], Histogram] = {}
+            self.bytes: Dict[Tuple[str, str], int] = defaultdict(int)
+            self.phases: Dict[str, List[float]] = {}
+            self.retries: Dict[str, int] = {}
+            self.throttled_seconds: Dict[str, float] = {}
+            self.extra: Dict[str, Dict] = {}
+
+    def record_call(self, api: str, url: str, status, seconds: float, bytes_sent: int, bytes_received: int) -> None:
+        """Record one HTTP attempt"""
+        endpoint = endpoint_label(url)
+        with self._lock:
+            self.calls[(api, endpoint, str(status))] += 1
+            if (api, endpoint) not in self.latency:
+                self.latency[(api, endpoint)] = Histogram()
+            self.latency[(api, endpoint)].observe(seconds)
+            self.bytes[(api, "sent")] += bytes_sent
+            self.bytes[(api, "received")] += bytes_received
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a block; concurrent blocks of the same phase add up"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                totals = self.phases.setdefault(name, [0, 0.0])
+                totals[0] += 1
+                totals[1] += elapsed
+
+    def set_scheduler_stats(self, api: str, retries: int, throttled_seconds: float) -> None:
+        with self._lock:
+            self.retries[api] = retries
+            self.throttled_seconds[api] = throttled_seconds
+
+    def set_extra(self, name: str, values: Dict) -> None:
+        """Attach run-level values such as sync stats or cache counts"""
+        with self._lock:
+            self.extra[name] = dict(values)
+
+    def finish(self) -> None:
+        with self._lock:
+            self.finished = time.time()
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            finished = self.finished or time.time()
+            calls: Dict[str, Dict[str, Dict[str, int]]] = {}
+            for (api, endpoint, status), count in sorted(self.calls.items()):
+                calls.setdefault(api, {}).setdefault(endpoint, {})[status] = count
+            return {
+                "started": self.started,
+                "wall_seconds": round(finished - self.started, 6),
+                "calls": calls,
+                "latency": {f"{api} {endpoint}": h.to_dict() for (api, endpoint), h in sorted(self.latency.items())},
+                "bytes": {f"{api} {direction}": n for (api, direction), n in sorted(self.bytes.items())},
+                "phases": {name: {"count": c, "seconds": round(s, 6)} for name, (c, s) in sorted(self.phases.items())},
+                "retries": dict(self.retries),
+                "throttled_seconds": {api: round(s, 6) for api, s in self.throttled_seconds.items()},
+                **{name: dict(values) for name, values in self.extra.items()}
+            }
+
+    def to_prometheus(self) -> str:
+        """Render the run as Prometheus text exposition format for the node_exporter textfile collector"""
+        summary = self.to_dict()
+        lines: List[str] = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[Tuple[Dict[str, str], float]]) -> None:
+            full_name = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+                suffix = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"{full_name}{suffix} {value}")
+
+        with self._lock:
+            call_samples = [({"api": a, "endpoint": e, "status": s}, n) for (a, e, s), n in sorted(self.calls.items())]
+            histograms = sorted(self.latency.items())
+            byte_samples = [({"api": a, "direction": d}, n) for (a, d), n in sorted(self.bytes.items())]
+
+        metric("last_run_timestamp_seconds", "gauge", "Unix time the last run started",
+               [({}, float(summary["started"]))])
+        metric("last_run_duration_seconds", "gauge", "Wall time of the last run",
+               [({}, float(summary["wall_seconds"]))])
+        metric("http_requests", "gauge", "HTTP requests sent in the last run", call_samples)
+
+        full_name = f"{METRIC_PREFIX}_http_request_duration_seconds"
+        lines.append(f"# HELP {full_name} HTTP request latency in the last run")
+        lines.append(f"# TYPE {full_name} histogram")
+        for (api, endpoint), histogram in histograms:
+            labels = f'api="{api}",endpoint="{endpoint}"'
+            for le, count in histogram.cumulative():
+                lines.append(f'{full_name}_bucket{{{labels},le="{le}"}} {count}')
+            lines.append(f"{full_name}_sum{{{labels}}} {histogram.total}")
+            lines.append(f"{full_name}_count{{{labels}}} {histogram.count}")
+
+        metric("http_bytes", "gauge", "Request and response body bytes in the last run", byte_samples)
+        metric("retries", "gauge", "Retried requests in the last run",
+               [({"api": api}, n) for api, n in sorted(summary["retries"].items())])
+        metric("throttled_seconds", "gauge", "Time spent waiting on rate limits in the last run",
+               [({"api": api}, float(s)) for api, s in sorted(summary["throttled_seconds"].items())])
+        metric("phase_seconds", "gauge", "Time spent in each sync phase, summed across threads",
+               [({"phase": name}, float(p["seconds"])) for name, p in summary["phases"].items()])
+        metric("phase_calls", "gauge", "Times each sync phase ran",
+               [({"phase": name}, p["count"]) for name, p in summary["phases"].items()])
+        for name, values in sorted(self.extra.items()):
+            metric(name, "gauge", f"{name.replace('_', ' ').capitalize()} in the last run",
+                   [({"result": key}, value) for key, value in sorted(values.items())])
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, json_path: Optional[str] = None, prom_path: Optional[str] = None) -> None:
+        """Write the JSON summary and/or Prometheus textfile, replacing any previous run's"""
+        if json_path:
+            _write_atomic(json_path, json.dumps(self.to_dict(), indent=2))
+        if prom_path:
+            _write_atomic(prom_path, self.to_prometheus())
+
+
+def _write_atomic(path: str, text: str) -> None:
+    # The textfile collector may read at any moment, so never expose a partial file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class RunProfiler:
+    """cProfile a run across the main thread and the sync worker threads.
+
+    Before Python 3.12 a profiler only sees the thread that enabled it, so
+    each worker starts its own through ``thread_initializer``. From 3.12 on
+    one profiler covers every thread and the per-thread ones are skipped.
+    """
+
+    def __init__(self):
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        self._enable()
+
+    def thread_initializer(self) -> None:
+        self._enable()
+
+    def _enable(self) -> None:
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active and covers this thread
+            return
+        with self._lock:
+            self._profiles.append(profile)
+
+    def stop(self, path: str) -> None:
+        """Disable profiling and write the merged stats to path"""
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return
+        profiles[0].disable()
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(path)
@@ -0,0 +1,159 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+def property_text(prop: Optional[Dict]) -> str:
+    """Flatten a Notion title or rich_text property into plain text"""
+    if not prop:
+        return ""
+    fragments = prop.get('title') or prop.get('rich_text') or []
+    parts = []
+    for fragment in fragments:
+        text = fragment.get('plain_text')
+        if text is None:
+            text = fragment.get('text', {}).get('content', '')
+        parts.append(text)
+    return "".join(parts)
+
+
+def property_value(prop: Optional[Dict]):
+    """Reduce a Notion property to a plain value that can be compared across API shapes.
+
+    Works on both the page objects Notion returns and the property dicts
+    built in process_assignment, so a built property and the stored one
+    compare equal exactly when writing it would change nothing.
+    """
+    if not prop:
+        return None
+    if 'title' in prop or 'rich_text' in prop:
+        return property_text(prop)
+    if 'date' in prop:
+        date = prop['date']
+        return date.get('start') if date else None
+    if 'number' in prop:
+        return prop['number']
+    for key in ('status', 'select'):
+        if key in prop:
+            option = prop[key]
+            return option.get('name') if option else None
+    if 'url' in prop:
+        # Notion stores an empty URL as null
+        return prop['url'] or None
+    return prop
+
+
+class NotionIndex:
+    """In-memory lookup of the pages already in the Notion database.
+
+    Pages are keyed by Canvas assignment id, and pages without one by
+    (Name, Course). A page that has a Canvas id belongs to that
+    assignment alone, so another assignment with the same name in the
+    course never matches it. The index is shared by worker threads, so
+    every access goes through a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_name: Dict[Tuple[str, str], str] = {}
+        self._by_canvas_id: Dict[int, str] = {}
+        self._values: Dict[str, Dict] = {}
+        self._pages: Dict[str, Tuple[str, str, Optional[int]]] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pages)
+
+    def pages(self) -> List[Tuple[str, str, str, Optional[int]]]:
+        """Every indexed page as (page id, name, course, Canvas id)"""
+        with self._lock:
+            return [(page_id, *key) for page_id, key in self._pages.items()]
+
+    def add_page(self, page: Dict) -> None:
+        """Index a page object as returned by the Notion API"""
+        properties = page.get('properties', {})
+        canvas_id = properties.get('Canvas ID', {}).get('number')
+        self.add(
+            page['id'],
+            property_text(properties.get('Name')),
+            property_text(properties.get('Course')),
+            int(canvas_id) if canvas_id is not None else None,
+            properties
+        )
+
+    def add(self, page_id: str, name: str, course: str, canvas_id: Optional[int] = None,
+            properties: Optional[Dict] = None) -> None:
+        """Record a page under its name/course key and optional Canvas id"""
+        with self._lock:
+            # Keep the first page seen for a key, matching find_existing_page's first result
+            self._pages[page_id] = (name, course, canvas_id)
+            if canvas_id is None:
+                self._by_name.setdefault((name, course), page_id)
+            else:
+                self._by_canvas_id.setdefault(canvas_id, page_id)
+            if properties is not None:
+                self._values[page_id] = {key: property_value(prop) for key, prop in properties.items()}
+
+    def changed_properties(self, page_id: str, properties: Dict) -> Dict:
+        """Return the subset of properties whose values differ from the indexed page"""
+        with self._lock:
+            current = self._values.get(page_id)
+        if current is None:
+            return properties
+        return {
+            key: prop for key, prop in properties.items()
+            if key not in current or property_value(prop) != current[key]
+        }
+
+    def update_properties(self, page_id: str, properties: Dict) -> None:
+        """Record property values just written to a page, re-keying it if it was renamed or given a Canvas id"""
+        with self._lock:
+            values = self._values.setdefault(page_id, {})
+            values.update({key: property_value(prop) for key, prop in properties.items()})
+            if page_id in self._pages and {'Name', 'Course', 'Canvas ID'} & set(properties):
+                name, course, canvas_id = self._pages[page_id]
+                if self._by_name.get((name, course)) == page_id:
+                    del self._by_name[(name, course)]
+                name = values.get('Name', name)
+                course = values.get('Course', course)
+                if values.get('Canvas ID') is not None:
+                    canvas_id = int(values['Canvas ID'])
+                self._pages[page_id] = (name, course, canvas_id)
+                if canvas_id is None:
+                    self._by_name.setdefault((name, course), page_id)
+                else:
+                    self._by_canvas_id.setdefault(canvas_id, page_id)
+
+    def remove(self, page_id: str) -> None:
+        """Drop an archived page from the index"""
+        with self._lock:
+            entry = self._pages.pop(page_id, None)
+            self._values.pop(page_id, None)
+            if entry is None:
+                return
+            name, course, canvas_id = entry
+            if self._by_name.get((name, course)) == page_id:
+                del self._by_name[(name, course)]
+            if canvas_id is not None and self._by_canvas_id.get(canvas_id) == page_id:
+                del self._by_canvas_id[canvas_id]
+
+    def orphans(self, canvas_ids: Set[int], courses: Iterable[str]) -> List[Tuple[str, str, str, int]]:
+        """Pages in the given courses whose Canvas ID is no longer in Canvas.
+
+        Pages without a Canvas ID were not made by the sync, or predate
+        the property, and are never reported.
+        """
+        courses = set(courses)
+        with self._lock:
+            missing = set(self._by_canvas_id) - canvas_ids
+            return [
+                (page_id, name, course, canvas_id)
+                for page_id, (name, course, canvas_id) in self._pages.items()
+                if canvas_id in missing and course in courses
+            ]
+
+    def find(self, name: str, course: str, canvas_id: Optional[int] = None) -> Optional[str]:
+        """Return the page id for an assignment: its Canvas id's page, or else a page with no Canvas id"""
+        with self._lock:
+            if canvas_id is not None and canvas_id in self._by_canvas_id:
+                return self._by_canvas_id[canvas_id]
+            return self._by_name.get((name, course))
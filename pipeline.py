@@ -0,0 +1,225 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from records import Course
+from sync_logging import log_context
+
+# Marks the end of a queue's input for one consumer
+_DONE = object()
+
+
+class StageStats:
+    """Items handled and busy time for one pipeline stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float, items: int = 1) -> None:
+        with self._lock:
+            self.items += items
+            self.busy_seconds += seconds
+
+
+class MonitoredQueue(queue.Queue):
+    """Bounded queue that tracks its peak and average depth at each put"""
+
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize)
+        self.max_depth = 0
+        self._depth_total = 0
+        self._puts = 0
+
+    def put(self, item, block: bool = True, timeout: Optional[float] = None) -> None:
+        super().put(item, block, timeout)
+        with self.mutex:
+            depth = self._qsize()
+            self.max_depth = max(self.max_depth, depth)
+            self._depth_total += depth
+            self._puts += 1
+
+    @property
+    def average_depth(self) -> float:
+        with self.mutex:
+            return self._depth_total / self._puts if self._puts else 0.0
+
+
+class SyncPipeline:
+    """Canvas fetch -> transform -> Notion write, joined by bounded queues.
+
+    Fetch workers stream each course's assignments into the first queue,
+    transform workers turn them into planned changes, and write workers
+    apply the changes to Notion. A full queue blocks the stage feeding it,
+    so a slow Notion side throttles Canvas reads instead of buffering a
+    whole semester in memory, while Canvas reads for later courses still
+    overlap Notion writes for earlier ones.
+    """
+
+    def __init__(self, syncer, fetch_workers: int, transform_workers: int, write_workers: int,
+                 queue_size: int = 100, thread_initializer: Optional[Callable[[], None]] = None):
+        self.syncer = syncer
+        self.fetch_workers = max(1, fetch_workers)
+        self.transform_workers = max(1, transform_workers)
+        self.write_workers = max(1, write_workers)
+        self.thread_initializer = thread_initializer
+
+        self.assignments: MonitoredQueue = MonitoredQueue(queue_size)
+        self.changes: MonitoredQueue = MonitoredQueue(queue_size)
+        self.stages = {name: StageStats(name) for name in ("fetch", "transform", "write")}
+        self.errors: List[Exception] = []
+        self._errors_lock = threading.Lock()
+        # course id -> [assignments still in flight, fully fetched, any failed]
+        self._courses: Dict[int, List] = {}
+        self._courses_lock = threading.Lock()
+        self.started = 0.0
+        self.finished = 0.0
+
+    def run(self, courses: List[Course]) -> None:
+        """Sync the given courses; raises the first course-level error once the pipeline drains"""
+        self.started = time.perf_counter()
+        course_queue: queue.Queue = queue.Queue()
+        for course in courses:
+            course_queue.put(course)
+
+        fetchers = self._start(self.fetch_workers, "fetch", self._fetch, course_queue)
+        transformers = self._start(self.transform_workers, "transform", self._transform)
+        writers = self._start(self.write_workers, "write", self._write)
+
+        # Each stage is closed once everything upstream of it has finished
+        for thread in fetchers:
+            thread.join()
+        for _ in transformers:
+            self.assignments.put(_DONE)
+        for thread in transformers:
+            thread.join()
+        for _ in writers:
+            self.changes.put(_DONE)
+        for thread in writers:
+            thread.join()
+        self.finished = time.perf_counter()
+
+        if self.errors:
+            raise self.errors[0]
+
+    def _start(self, count: int, name: str, target: Callable, *args) -> List[threading.Thread]:
+        threads = []
+        for i in range(count):
+            thread = threading.Thread(target=self._run_worker, args=(target, *args), name=f"{name}-{i}", daemon=True)
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def _run_worker(self, target: Callable, *args) -> None:
+        if self.thread_initializer is not None:
+            self.thread_initializer()
+        target(*args)
+
+    def _fetch(self, course_queue: queue.Queue) -> None:
+        stats = self.stages["fetch"]
+        while True:
+            try:
+                course = course_queue.get_nowait()
+            except queue.Empty:
+                return
+
+            with log_context(course_id=course.id):
+                self._fetch_course(course, stats)
+
+    def _fetch_course(self, course: Course, stats: StageStats) -> None:
+        course_name = course.name
+        self.syncer.logger.info(f"Processing course: {course_name}")
+        count = 0
+        started = time.perf_counter()
+        try:
+            for assignment in self.syncer.iter_course_assignments(course.id):
+                stats.add(time.perf_counter() - started)
+                count += 1
+                self._track(course.id, 1)
+                # Blocks while the transform stage is behind
+                self.assignments.put((assignment, course_name, course.id))
+                started = time.perf_counter()
+        except Exception as e:
+            self.syncer.logger.error(f"Failed to fetch assignments for {course_name}: {str(e)}")
+            with self._errors_lock:
+                self.errors.append(e)
+            self._track(course.id, 0, fetched=True, failed=True)
+            return
+
+        self.syncer.logger.info(f"Found {count} assignments in {course_name}")
+        self._track(course.id, 0, fetched=True)
+
+    def _transform(self) -> None:
+        stats = self.stages["transform"]
+        while True:
+            item = self.assignments.get()
+            if item is _DONE:
+                return
+            assignment, course_name, course_id = item
+
+            started = time.perf_counter()
+            with log_context(course_id=course_id, assignment_id=assignment.id):
+                try:
+                    change = self.syncer.plan_assignment(assignment, course_name, course_id)
+                    if change.action == "unchanged":
+                        # Nothing to send to Notion; record it here rather than queueing it
+                        self.syncer.apply_change(change)
+                        self._track(course_id, -1)
+                        change = None
+                except Exception as e:
+                    self.syncer.logger.error(f"Failed to process assignment {assignment.name}: {str(e)}")
+                    self.syncer.record_stat("failed")
+                    self._track(course_id, -1, failed=True)
+                    change = None
+            stats.add(time.perf_counter() - started)
+
+            if change is not None:
+                self.changes.put((change, course_id))
+
+    def _write(self) -> None:
+        stats = self.stages["write"]
+        while True:
+            item = self.changes.get()
+            if item is _DONE:
+                return
+            change, course_id = item
+
+            started = time.perf_counter()
+            with log_context(course_id=course_id, assignment_id=change.assignment_id):
+                try:
+                    self.syncer.apply_change(change)
+                    self._track(course_id, -1)
+                except Exception as e:
+                    self.syncer.logger.error(f"Failed to {change.action} page for {change.name}: {str(e)}")
+                    self.syncer.record_stat("failed")
+                    self._track(course_id, -1, failed=True)
+            stats.add(time.perf_counter() - started)
+
+    def _track(self, course_id: int, in_flight: int, fetched: bool = False, failed: bool = False) -> None:
+        """Update a course's progress and checkpoint it once all of its assignments are written"""
+        with self._courses_lock:
+            entry = self._courses.setdefault(course_id, [0, False, False])
+            entry[0] += in_flight
+            entry[1] = entry[1] or fetched
+            entry[2] = entry[2] or failed
+            finished = entry[1] and entry[0] == 0
+            if finished:
+                del self._courses[course_id]
+        if finished and not entry[2]:
+            self.syncer.course_done(course_id)
+
+    def stats(self) -> Dict[str, float]:
+        """Flat per-stage throughput and queue depth figures for logging and metrics"""
+        wall = max(self.finished - self.started, 1e-9)
+        result: Dict[str, float] = {"wall_seconds": round(wall, 6)}
+        for name, stage in self.stages.items():
+            result[f"{name}_items"] = stage.items
+            result[f"{name}_busy_seconds"] = round(stage.busy_seconds, 6)
+            result[f"{name}_items_per_second"] = round(stage.items / wall, 3)
+        for name, q in (("assignments_queue", self.assignments), ("changes_queue", self.changes)):
+            result[f"{name}_max_depth"] = q.max_depth
+            result[f"{name}_average_depth"] = round(q.average_depth, 3)
+        return result
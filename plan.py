@@ -0,0 +1,79 @@
+import json
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional
+
+PLAN_VERSION = 1
+
+# Plan actions, in the order they're reported
+ACTIONS = ("create", "update", "unchanged", "orphaned")
+
+
+class Change(NamedTuple):
+    """One planned change to the Notion database.
+
+    ``properties`` holds the full property set for a create and only the
+    differing properties for an update. ``reason`` records why an entry
+    is unchanged ("state" when the local sync state let us skip it) or
+    that an update renames the page ("renamed").
+    """
+    action: str
+    name: str
+    course: str
+    assignment_id: Optional[int] = None
+    page_id: Optional[str] = None
+    properties: Dict = {}
+    properties_hash: Optional[str] = None
+    canvas_updated_at: Optional[str] = None
+    reason: str = ""
+
+
+class SyncPlan:
+    """Serializable change set produced by the planning stage and consumed by apply"""
+
+    def __init__(self, database_id: str, changes: Optional[List[Change]] = None, created_at: Optional[str] = None):
+        self.database_id = database_id
+        self.changes: List[Change] = list(changes or [])
+        self.created_at = created_at or datetime.now(timezone.utc).isoformat()
+
+    def add(self, change: Change) -> None:
+        self.changes.append(change)
+
+    def by_action(self, action: str) -> List[Change]:
+        return [change for change in self.changes if change.action == action]
+
+    def counts(self) -> Dict[str, int]:
+        counts = {action: 0 for action in ACTIONS}
+        for change in self.changes:
+            counts[change.action] += 1
+        return counts
+
+    def writes(self) -> List[Change]:
+        """Changes that need a Notion request"""
+        return [change for change in self.changes if change.action in ("create", "update")]
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": PLAN_VERSION,
+            "created_at": self.created_at,
+            "database_id": self.database_id,
+            "changes": [change._asdict() for change in self.changes]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SyncPlan':
+        if data.get("version") != PLAN_VERSION:
+            raise ValueError(f"Unsupported plan version: {data.get('version')}")
+        changes = [Change(**change) for change in data.get("changes", [])]
+        return cls(data["database_id"], changes, data.get("created_at"))
+
+    def save(self, path: str) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'SyncPlan':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
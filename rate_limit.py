@@ -0,0 +1,150 @@
+import logging
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+import requests
+
+# Status codes worth retrying: throttling plus transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a request may be sent"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.base_rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping as needed; returns the time spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                else:
+                    delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for a while, e.g. after a Retry-After"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+    def scale(self, factor: float) -> None:
+        """Run at a fraction of the configured rate"""
+        with self._lock:
+            self.rate = self.base_rate * max(0.05, min(1.0, factor))
+
+
+class RequestScheduler:
+    """Sends every request for one API through a token bucket with retries.
+
+    429 and transient 5xx responses are retried with jittered exponential
+    backoff, or after the server's Retry-After when it sends one. A 429
+    pauses the whole bucket so other threads back off too. When
+    ``remaining_header`` is set (Canvas sends X-Rate-Limit-Remaining), the
+    request rate is scaled down as the remaining quota approaches zero.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: Optional[float] = None, max_retries: int = 5,
+                 base_delay: float = 0.5, max_delay: float = 30.0,
+                 remaining_header: Optional[str] = None, remaining_low: float = 200.0):
+        self.name = name
+        self.bucket = TokenBucket(rate, capacity)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.remaining_header = remaining_header
+        self.remaining_low = remaining_low
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        """Zero the retry and throttling counters at the start of a run"""
+        with self._lock:
+            self.retries = 0
+            self.throttled_seconds = 0.0
+
+    def send(self, request: Callable[[], requests.Response], idempotent: bool = True) -> requests.Response:
+        """Run request() under the rate limit, retrying throttled and transient failures.
+
+        Non-idempotent requests are only retried on 429, since a 5xx may
+        come back after the server already applied the change.
+        """
+        attempt = 0
+        while True:
+            self._add_throttled(self.bucket.acquire())
+            try:
+                response = request()
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                self.logger.warning(f"{self.name} request failed ({str(e)}), retrying in {delay:.1f}s")
+            else:
+                self._observe_quota(response)
+                retryable = response.status_code == 429 or (idempotent and response.status_code in RETRY_STATUSES)
+                if not retryable or attempt >= self.max_retries:
+                    return response
+
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                if response.status_code == 429:
+                    self.bucket.pause(delay)
+                self.logger.warning(f"{self.name} returned {response.status_code}, retrying in {delay:.1f}s")
+
+            with self._lock:
+                self.retries += 1
+            time.sleep(delay)
+            self._add_throttled(delay)
+            attempt += 1
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> Optional[float]:
+        value = response.headers.get('Retry-After')
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return None
+
+    def _observe_quota(self, response: requests.Response) -> None:
+        if not self.remaining_header:
+            return
+        remaining = response.headers.get(self.remaining_header)
+        if remaining is None:
+            return
+        try:
+            self.bucket.scale(float(remaining) / self.remaining_low)
+        except ValueError:
+            pass
+
+    def _add_throttled(self, seconds: float) -> None:
+        if seconds:
+            with self._lock:
+                self.throttled_seconds += seconds
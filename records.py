@@ -0,0 +1,134 @@
+import logging
+from datetime import datetime, timezone
+from typing import Dict, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse a Canvas ISO 8601 timestamp into an aware UTC datetime, or None"""
+    if not value:
+        return None
+    try:
+        # fromisoformat only takes a trailing Z from Python 3.11
+        parsed = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+    except ValueError:
+        logger.warning(f"Could not parse date: {value}")
+        return None
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    if parsed.utcoffset():
+        return parsed.astimezone(timezone.utc)
+    return parsed
+
+
+def submission_status(submission: Dict) -> str:
+    """Map a Canvas submission object to our submission status values"""
+    if submission.get('submitted_at'):
+        if submission.get('graded_at'):
+            return "Graded"
+        return "Submitted"
+    return "Not Submitted"
+
+
+def points_value(points) -> float:
+    if points is None:
+        return 0
+    try:
+        return float(points)
+    except (ValueError, TypeError):
+        return 0
+
+
+class Course(NamedTuple):
+    """The fields of a Canvas course the sync uses"""
+    id: int
+    name: str
+    term: str = ""
+
+    @classmethod
+    def from_canvas(cls, data: Dict) -> "Course":
+        return cls(data['id'], data['name'], (data.get('term') or {}).get('name', ''))
+
+
+class Assignment(NamedTuple):
+    """The fields of a Canvas assignment the sync uses.
+
+    Built once from each API record so the rest of the JSON, which can be
+    most of it (descriptions, rubrics, lock info), is dropped as soon as
+    the page is read. ``submission_status`` is None when the record had no
+    submission embedded and it has to be looked up separately.
+    """
+    id: int
+    name: str
+    due_at: Optional[datetime] = None
+    points: float = 0
+    html_url: Optional[str] = ''
+    updated_at: Optional[str] = None
+    submission_status: Optional[str] = None
+
+    @classmethod
+    def from_canvas(cls, data: Dict) -> "Assignment":
+        """Build from a REST API assignment, with or without ``include[]=submission``"""
+        submission = data.get('submission')
+        return cls(
+            data['id'],
+            data['name'],
+            parse_timestamp(data.get('due_at')),
+            points_value(data.get('points_possible')),
+            data.get('html_url', ''),
+            data.get('updated_at'),
+            submission_status(submission) if submission else None
+        )
+
+
+class SyncRecord(NamedTuple):
+    """The values written to one Notion page"""
+    canvas_id: int
+    name: str
+    course: str
+    due_date: Optional[str]
+    points: float
+    submission_status: str
+    url: Optional[str]
+
+    @classmethod
+    def from_assignment(cls, assignment: Assignment, course_name: str, submission_status: str) -> "SyncRecord":
+        # Notion gets the due day in UTC, as Canvas reports it
+        due_date = assignment.due_at.date().isoformat() if assignment.due_at else None
+        return cls(assignment.id, assignment.name, course_name, due_date, assignment.points, submission_status,
+                   assignment.html_url)
+
+    def properties(self) -> Dict:
+        """The Notion page properties for this record"""
+        return {
+            "Name": {
+                "title": [{"text": {"content": self.name}}]
+            },
+            "Course": {
+                "rich_text": [{"text": {"content": self.course}}]
+            },
+            "Due Date": {
+                "date": {"start": self.due_date} if self.due_date else None
+            },
+            "Points": {
+                "number": self.points
+            },
+            "Status": {
+                "status": {
+                    "name": "Done" if self.submission_status in ["Graded", "Submitted"] else "Not started"
+                }
+            },
+            "Submission Status": {
+                "select": {
+                    "name": self.submission_status
+                }
+            },
+            "Canvas URL": {
+                "url": self.url
+            },
+            # Pages are matched on this, so a renamed assignment keeps its page
+            "Canvas ID": {
+                "number": self.canvas_id
+            }
+        }
@@ -0,0 +1,129 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from typing import Iterator, Optional
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Ids attached to every record, for the JSON lines format
+CONTEXT_FIELDS = ("run_id", "course_id", "assignment_id")
+
+_context = threading.local()
+_run_id: Optional[str] = None
+_listener: Optional[QueueListener] = None
+_listener_pid: Optional[int] = None
+
+
+def set_run_id(run_id: Optional[str]) -> None:
+    """Tag every record logged from now on, from any thread, with this run id"""
+    global _run_id
+    _run_id = run_id
+
+
+@contextmanager
+def log_context(**ids) -> Iterator[None]:
+    """Tag records logged by this thread inside the block with a course_id and/or assignment_id"""
+    previous = {key: getattr(_context, key, None) for key in ids}
+    for key, value in ids.items():
+        setattr(_context, key, value)
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            setattr(_context, key, value)
+
+
+class ContextFilter(logging.Filter):
+    """Copies the run, course and assignment ids onto each record in the thread that logs it"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.run_id = _run_id
+        record.course_id = getattr(_context, 'course_id', None)
+        record.assignment_id = getattr(_context, 'assignment_id', None)
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record, including whichever context ids are set"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def configure_logging(path: Optional[str] = 'sync_log.txt', level: int = logging.INFO, json_lines: bool = False,
+                      max_bytes: int = 5 * 1024 * 1024, backup_count: int = 5, rotate_when: Optional[str] = None,
+                      console: bool = True, force: bool = False) -> None:
+    """Send all logging through a queue to a background thread that writes the file and console.
+
+    Logging calls only enqueue the record, so worker threads never wait on
+    file I/O. The file rotates at ``max_bytes``, or on the ``rotate_when``
+    schedule (e.g. "midnight") when that is given, keeping ``backup_count``
+    old files. Like logging.basicConfig, this does nothing if the root
+    logger already has handlers, unless ``force`` is set.
+    """
+    global _listener, _listener_pid
+    root = logging.getLogger()
+    if root.handlers and not force:
+        return
+
+    shutdown_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+    formatter = JsonLinesFormatter() if json_lines else logging.Formatter(LOG_FORMAT)
+    handlers = []
+    if path:
+        if rotate_when:
+            file_handler = TimedRotatingFileHandler(path, when=rotate_when, backupCount=backup_count,
+                                                    encoding='utf-8', delay=True)
+        else:
+            file_handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                               encoding='utf-8', delay=True)
+        handlers.append(file_handler)
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    records: queue.Queue = queue.Queue()
+    queue_handler = QueueHandler(records)
+    queue_handler.addFilter(ContextFilter())
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    _listener_pid = os.getpid()
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the background writer"""
+    global _listener, _listener_pid
+    # A forked child inherits the listener object but not its thread
+    if _listener is not None and _listener_pid == os.getpid():
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+    _listener = None
+    _listener_pid = None
+
+
+atexit.register(shutdown_logging)
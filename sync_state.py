@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Dict, NamedTuple, Optional
+
+
+def property_hash(properties: Dict) -> str:
+    """Stable hash of a Notion properties dict"""
+    encoded = json.dumps(properties, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class AssignmentState(NamedTuple):
+    canvas_id: int
+    page_id: str
+    property_hash: Optional[str]
+    canvas_updated_at: Optional[str]
+
+
+class SyncStateStore:
+    """On-disk record of what the last runs wrote to Notion.
+
+    Maps each Canvas assignment id to its Notion page id, the hash of the
+    properties last synced and the Canvas updated_at seen at the time.
+    Worker threads share one connection, guarded by a lock.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+
+    @classmethod
+    def recreate(cls, path: str) -> 'SyncStateStore':
+        """Delete any existing (possibly corrupt) store at path and open an empty one"""
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        return cls(path)
+
+    def _create_tables(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS assignments (
+                    canvas_id INTEGER PRIMARY KEY,
+                    page_id TEXT NOT NULL,
+                    property_hash TEXT,
+                    canvas_updated_at TEXT,
+                    synced_at TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM assignments").fetchone()[0]
+
+    def get(self, canvas_id: int) -> Optional[AssignmentState]:
+        """Return the stored state for an assignment, if any"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT canvas_id, page_id, property_hash, canvas_updated_at FROM assignments WHERE canvas_id = ?",
+                (canvas_id,)
+            ).fetchone()
+        return AssignmentState(*row) if row else None
+
+    def record(self, canvas_id: int, page_id: str, properties_hash: Optional[str],
+               canvas_updated_at: Optional[str]) -> None:
+        """Insert or replace the state for an assignment"""
+        synced_at = datetime.now(timezone.utc).isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO assignments (canvas_id, page_id, property_hash, canvas_updated_at, synced_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(canvas_id) DO UPDATE SET
+                    page_id = excluded.page_id,
+                    property_hash = excluded.property_hash,
+                    canvas_updated_at = excluded.canvas_updated_at,
+                    synced_at = excluded.synced_at
+                """,
+                (canvas_id, page_id, properties_hash, canvas_updated_at, synced_at)
+            )
+
+    def forget(self, canvas_id: int) -> None:
+        """Remove the state for an assignment whose page was archived"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM assignments WHERE canvas_id = ?", (canvas_id,))
+
+    def get_meta(self, key: str) -> Optional[str]:
+        """Return a run-level value saved by set_meta, if any"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        """Save a run-level value, such as when the last full sync finished"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value)
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
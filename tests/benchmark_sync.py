@@ -0,0 +1,162 @@
+"""Benchmark sync_assignments against synthetic semesters served by the mock APIs.
+
+For each semester size the sync runs twice against fresh mock servers: a
+cold run that creates every page and a steady-state run with nothing to
+change. Each run reports wall time, HTTP calls per assignment, and peak
+traced memory in total and per assignment. The mock servers run in a
+child process so their work doesn't count against the client's time or
+memory.
+
+    python tests/benchmark_sync.py --sizes 10 100 1000 --json bench.json
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+from typing import Dict, List
+
+# Add the parent directory to the path for importing main
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Configure logging first so CanvasNotionSync doesn't write to sync_log.txt
+logging.basicConfig(level=logging.WARNING, handlers=[logging.NullHandler()])
+
+import requests
+
+from main import CanvasNotionSync
+from mock_servers import MockCanvas, MockNotion, point_syncer, synthetic_semester
+
+
+def _serve(courses: int, assignments_per_course: int, options: Dict, conn) -> None:
+    """Child process: run both mock servers until told to stop"""
+    semester = synthetic_semester(courses, assignments_per_course)
+    canvas = MockCanvas(semester, latency=options["latency"], throttle_every=options["throttle_every"]).start()
+    notion = MockNotion(latency=options["latency"], throttle_every=options["throttle_every"]).start()
+    conn.send((canvas.url, notion.url, notion.database_id))
+    conn.recv()
+    canvas.stop()
+    notion.stop()
+
+
+def _call_count(url: str) -> int:
+    stats = requests.get(f"{url}/_mock/stats", timeout=10).json()
+    return sum(stats["calls"].values())
+
+
+def run_case(courses: int, args: argparse.Namespace) -> List[Dict]:
+    """Benchmark a cold and a steady-state sync for one semester size"""
+    parent_conn, child_conn = multiprocessing.Pipe()
+    options = {"latency": args.latency, "throttle_every": args.throttle_every}
+    server = multiprocessing.Process(target=_serve, args=(courses, args.assignments, options, child_conn))
+    server.start()
+    canvas_url, notion_url, database_id = parent_conn.recv()
+
+    syncer = CanvasNotionSync(
+        "canvas-key", "canvas.example.edu", "notion-key", database_id,
+        concurrent=not args.sequential,
+        canvas_concurrency=args.canvas_concurrency,
+        notion_concurrency=args.notion_concurrency,
+        canvas_rate=args.canvas_rate,
+        notion_rate=args.notion_rate,
+        canvas_graphql=args.canvas_graphql
+    )
+    point_syncer(syncer, canvas_url, notion_url, database_id)
+    total_assignments = courses * args.assignments
+
+    results = []
+    try:
+        for label in ("cold", "steady"):
+            canvas_before, notion_before = _call_count(canvas_url), _call_count(notion_url)
+            if args.memory:
+                tracemalloc.start()
+
+            started = time.perf_counter()
+            syncer.sync_assignments()
+            wall = time.perf_counter() - started
+
+            peak = None
+            if args.memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+            canvas_calls = _call_count(canvas_url) - canvas_before
+            notion_calls = _call_count(notion_url) - notion_before
+            results.append({
+                "courses": courses,
+                "assignments": total_assignments,
+                "run": label,
+                "wall_seconds": round(wall, 3),
+                "canvas_calls": canvas_calls,
+                "notion_calls": notion_calls,
+                "calls_per_assignment": round((canvas_calls + notion_calls) / max(1, total_assignments), 3),
+                "peak_memory_bytes": peak,
+                "peak_bytes_per_assignment": round(peak / max(1, total_assignments)) if peak is not None else None,
+                "stats": dict(syncer.stats)
+            })
+    finally:
+        syncer.close()
+        parent_conn.send("stop")
+        server.join()
+
+    return results
+
+
+def print_table(results: List[Dict]) -> None:
+    print(f"{'courses':>8} {'assign':>7} {'run':>7} {'wall s':>8} {'canvas':>7} {'notion':>7} "
+          f"{'calls/asg':>9} {'peak MB':>8} {'KB/asg':>7}")
+    for r in results:
+        peak, per_assignment = "-", "-"
+        if r['peak_memory_bytes'] is not None:
+            peak = f"{r['peak_memory_bytes'] / (1024 * 1024):.1f}"
+            per_assignment = f"{r['peak_bytes_per_assignment'] / 1024:.2f}"
+        print(f"{r['courses']:>8} {r['assignments']:>7} {r['run']:>7} {r['wall_seconds']:>8.2f} "
+              f"{r['canvas_calls']:>7} {r['notion_calls']:>7} {r['calls_per_assignment']:>9.2f} {peak:>8} "
+              f"{per_assignment:>7}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the Canvas to Notion sync against mock APIs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000],
+                        help="numbers of courses to benchmark (default: 10 100 1000)")
+    parser.add_argument("--assignments", type=int, default=10,
+                        help="assignments per course (default: 10)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds of latency the mock servers add to each request")
+    parser.add_argument("--throttle-every", type=int, default=0,
+                        help="answer every Nth request with a 429")
+    parser.add_argument("--sequential", action="store_true",
+                        help="benchmark the sequential sync path")
+    parser.add_argument("--canvas-graphql", action="store_true",
+                        help="fetch Canvas data through GraphQL")
+    parser.add_argument("--canvas-concurrency", type=int, default=4)
+    parser.add_argument("--notion-concurrency", type=int, default=3)
+    parser.add_argument("--canvas-rate", type=float, default=10000.0,
+                        help="Canvas requests per second (default: effectively unlimited)")
+    parser.add_argument("--notion-rate", type=float, default=10000.0,
+                        help="Notion requests per second (default: effectively unlimited)")
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="skip tracemalloc, which slows the run down")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> List[Dict]:
+    args = parse_args(argv)
+    results = []
+    for courses in args.sizes:
+        results.extend(run_case(courses, args))
+    print_table(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
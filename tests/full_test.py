@@ -7,6 +7,7 @@ from dotenv import load_dotenv
 # Add the parent directory to the path for importing main
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from main import CanvasNotionSync
+from records import Assignment
 
 class TestCanvasNotionSync(unittest.TestCase):
     @classmethod
@@ -48,10 +49,10 @@ class TestCanvasNotionSync(unittest.TestCase):
         self.assertIsInstance(courses, list, "get_canvas_courses should return a list")
         print(f"Found {len(courses)} current semester courses:")
         for course in courses:
-            print(f"- {course['name']}")
-            self.assertIn('id', course, "Course should have an ID")
-            self.assertIn('name', course, "Course should have a name")
-            self.assertIn('term', course, "Course should have term information")
+            print(f"- {course.name}")
+            self.assertIsNotNone(course.id, "Course should have an ID")
+            self.assertTrue(course.name, "Course should have a name")
+            self.assertTrue(course.term, "Course should have term information")
 
     def test_3_assignments(self):
         """Test assignment retrieval for the first course"""
@@ -61,15 +62,15 @@ class TestCanvasNotionSync(unittest.TestCase):
             self.skipTest("No courses found to test assignments")
         
         test_course = courses[0]
-        print(f"Testing with course: {test_course['name']}")
-        assignments = self.syncer.get_course_assignments(test_course['id'])
+        print(f"Testing with course: {test_course.name}")
+        assignments = self.syncer.get_course_assignments(test_course.id)
         
         self.assertIsInstance(assignments, list, "get_course_assignments should return a list")
         print(f"Found {len(assignments)} assignments:")
         for assignment in assignments:
-            print(f"- {assignment['name']}")
-            self.assertIn('id', assignment, "Assignment should have an ID")
-            self.assertIn('name', assignment, "Assignment should have a name")
+            print(f"- {assignment.name}")
+            self.assertIsNotNone(assignment.id, "Assignment should have an ID")
+            self.assertIsNotNone(assignment.name, "Assignment should have a name")
 
     def test_4_submission_status(self):
         """Test submission status retrieval"""
@@ -79,28 +80,28 @@ class TestCanvasNotionSync(unittest.TestCase):
             self.skipTest("No courses found to test submission status")
             
         test_course = courses[0]
-        assignments = self.syncer.get_course_assignments(test_course['id'])
+        assignments = self.syncer.get_course_assignments(test_course.id)
         if not assignments:
             self.skipTest("No assignments found to test submission status")
             
         test_assignment = assignments[0]
-        status = self.syncer.get_submission_status(test_course['id'], test_assignment['id'])
-        print(f"Submission status for '{test_assignment['name']}': {status}")
+        status = self.syncer.get_submission_status(test_course.id, test_assignment.id)
+        print(f"Submission status for '{test_assignment.name}': {status}")
         self.assertIn(status, ["Not Submitted", "Submitted", "Graded", "Unknown"])
 
     def test_5_notion_connection(self):
         """Test Notion API connection by creating a test page"""
         print("\nTesting Notion connection...")
-        test_assignment = {
+        test_assignment = Assignment.from_canvas({
             'name': 'Test Assignment (Will be deleted)',
             'due_at': datetime.now().isoformat() + 'Z',
             'points_possible': 100,
             'html_url': 'https://example.com',
             'id': 0
-        }
+        })
         
         try:
-            self.syncer.create_notion_page(
+            self.syncer.process_assignment(
                 assignment=test_assignment,
                 course_name="TEST COURSE",
                 course_id=0
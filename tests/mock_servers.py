@@ -0,0 +1,500 @@
+"""In-process stand-ins for the Canvas and Notion endpoints used by main.py.
+
+Both servers run on localhost in a background thread and count every
+call by endpoint. Latency, page size and 429 injection are configurable
+so the sync can be tested and benchmarked without touching the real
+APIs. Point a CanvasNotionSync at them with ``point_syncer``.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+
+Route = Tuple[int, Dict[str, str], Any]
+
+
+def synthetic_semester(courses: int, assignments_per_course: int, submitted_ratio: float = 0.5,
+                       seed: int = 0) -> Dict:
+    """Build a deterministic set of current-term courses and assignments"""
+    rng = random.Random(seed)
+    semester = {"courses": [], "assignments": {}}
+    for c in range(1, courses + 1):
+        course = {
+            "id": c,
+            "name": f"2025SP-BENCH-{c:04d}",
+            "term": {"id": 1, "name": "2025 Spring"}
+        }
+        semester["courses"].append(course)
+
+        assignments = []
+        for a in range(assignments_per_course):
+            assignment_id = c * 100000 + a
+            submitted = rng.random() < submitted_ratio
+            graded = submitted and rng.random() < 0.5
+            assignments.append({
+                "id": assignment_id,
+                "course_id": c,
+                "name": f"Assignment {a + 1}",
+                "due_at": f"2025-{rng.randint(1, 5):02d}-{rng.randint(1, 28):02d}T05:59:59Z",
+                "points_possible": float(rng.choice([10, 20, 50, 100])),
+                "html_url": f"https://canvas.example.edu/courses/{c}/assignments/{assignment_id}",
+                "updated_at": "2025-01-15T12:00:00Z",
+                # Bulk the records up the way real Canvas payloads are
+                "description": "<p>" + "Lorem ipsum dolor sit amet. " * 30 + "</p>",
+                "rubric": [{"id": f"r{i}", "points": 5, "description": "Criterion"} for i in range(3)],
+                "submission": {
+                    "assignment_id": assignment_id,
+                    "submitted_at": "2025-01-20T10:00:00Z" if submitted else None,
+                    "graded_at": "2025-01-22T10:00:00Z" if graded else None,
+                    "workflow_state": "graded" if graded else ("submitted" if submitted else "unsubmitted")
+                }
+            })
+        semester["assignments"][c] = assignments
+    return semester
+
+
+class MockServer:
+    """Threaded HTTP server running in the background with call counting and fault injection.
+
+    ``latency`` seconds are added to every request. When ``throttle_every``
+    is N > 0, every Nth request is answered with a 429 and a Retry-After
+    of ``retry_after`` seconds.
+    """
+
+    def __init__(self, latency: float = 0.0, throttle_every: int = 0, retry_after: float = 0.05):
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.calls: Counter = Counter()
+        self.throttled = 0
+        self.lock = threading.Lock()
+        self._request_count = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'MockServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'MockServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def total_calls(self) -> int:
+        with self.lock:
+            return sum(self.calls.values())
+
+    def route(self, method: str, path: str, query: Dict[str, List[str]], body: Any,
+              headers: Dict[str, str]) -> Optional[Tuple[str, Route]]:
+        """Return (endpoint name, response) for a request, or None for a 404"""
+        raise NotImplementedError
+
+    def dispatch(self, method: str, raw_path: str, body: Any, headers: Dict[str, str]) -> Route:
+        parsed = urlparse(raw_path)
+        if parsed.path == "/_mock/stats":
+            with self.lock:
+                return 200, {}, {"calls": dict(self.calls), "throttled": self.throttled}
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self.lock:
+            self._request_count += 1
+            throttle = self.throttle_every and self._request_count % self.throttle_every == 0
+            if throttle:
+                self.throttled += 1
+        if throttle:
+            return 429, {"Retry-After": str(self.retry_after)}, {"object": "error", "code": "rate_limited"}
+
+        result = self.route(method, parsed.path, parse_qs(parsed.query), body, headers)
+        if result is None:
+            return 404, {}, {"message": "not found"}
+        endpoint, response = result
+        with self.lock:
+            self.calls[endpoint] += 1
+        return response
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; don't let Nagle delay the body
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self, method: str):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                body = json.loads(raw) if raw else None
+                headers = {key: value for key, value in self.headers.items()}
+                headers["Host"] = self.headers.get("Host", "")
+
+                status, extra_headers, payload = server.dispatch(method, self.path, body, headers)
+                data = b"" if payload is None else json.dumps(payload).encode("utf-8")
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in extra_headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def do_PATCH(self):
+                self._handle("PATCH")
+
+        return Handler
+
+
+class MockCanvas(MockServer):
+    """Canvas REST endpoints for courses, assignments, submissions and the planner, plus GraphQL.
+
+    List endpoints paginate with Link headers (``default_per_page`` unless
+    per_page is given, capped at ``max_per_page``) and send ETags so
+    conditional requests can be answered with 304. ``graphql=False``
+    makes /api/graphql answer with errors, as when it's unavailable.
+    """
+
+    def __init__(self, semester: Dict, default_per_page: int = 10, max_per_page: int = 100,
+                 rate_limit_remaining: float = 700.0, graphql: bool = True, **kwargs):
+        super().__init__(**kwargs)
+        self.semester = semester
+        self.default_per_page = default_per_page
+        self.max_per_page = max_per_page
+        self.rate_limit_remaining = rate_limit_remaining
+        self.graphql = graphql
+
+    def route(self, method, path, query, body, headers):
+        if method == "POST" and path == "/api/graphql":
+            return "graphql", self._graphql((body or {}).get("query", ""))
+        if method != "GET":
+            return None
+
+        if path == "/api/v1/courses":
+            courses = self.semester["courses"]
+            for key, field in (("enrollment_type", "type"), ("enrollment_state", "enrollment_state")):
+                if key in query:
+                    courses = [c for c in courses if _enrollment(c)[field] == query[key][0]]
+            return "courses", self._paginate(courses, path, query, headers)
+
+        if path == "/api/v1/planner/items":
+            return "planner", self._paginate(self._planner_items(query), path, query, headers)
+
+        match = re.fullmatch(r"/api/v1/courses/(\d+)/assignments", path)
+        if match:
+            assignments = self.semester["assignments"].get(int(match.group(1)), [])
+            if "assignment_ids[]" in query:
+                wanted = {int(assignment_id) for assignment_id in query["assignment_ids[]"]}
+                assignments = [a for a in assignments if a["id"] in wanted]
+            if "submission" not in query.get("include[]", []):
+                assignments = [{k: v for k, v in a.items() if k != "submission"} for a in assignments]
+            return "assignments", self._paginate(assignments, path, query, headers)
+
+        match = re.fullmatch(r"/api/v1/courses/(\d+)/assignments/(\d+)/submissions/self", path)
+        if match:
+            for assignment in self.semester["assignments"].get(int(match.group(1)), []):
+                if assignment["id"] == int(match.group(2)):
+                    return "submission", (200, self._quota_headers(), assignment["submission"])
+            return "submission", (404, {}, {"errors": [{"message": "not found"}]})
+
+        return None
+
+    def _planner_items(self, query: Dict[str, List[str]]) -> List[Dict]:
+        """Assignments due between start_date and end_date across every course, soonest first.
+
+        An assignment with a ``discussion_topic`` id is listed as that graded
+        discussion, which like real Canvas carries the topic's own fields
+        and none of the assignment's due date or points.
+        """
+        start = query.get("start_date", [""])[0]
+        end = query.get("end_date", ["9999"])[0]
+        items = []
+        for course in self.semester["courses"]:
+            for assignment in self.semester["assignments"].get(course["id"], []):
+                due = assignment.get("due_at")
+                if not due or not start <= due <= end:
+                    continue
+                submission = assignment.get("submission") or {}
+                item = {
+                    "context_type": "Course",
+                    "course_id": course["id"],
+                    "context_name": course["name"],
+                    "plannable_id": assignment["id"],
+                    "plannable_type": "assignment",
+                    "plannable_date": due,
+                    "html_url": f"/courses/{course['id']}/assignments/{assignment['id']}",
+                    "plannable": {
+                        "id": assignment["id"],
+                        "title": assignment["name"],
+                        "due_at": due,
+                        "points_possible": assignment.get("points_possible"),
+                        "updated_at": assignment.get("updated_at")
+                    },
+                    "submissions": {
+                        "submitted": bool(submission.get("submitted_at")),
+                        "graded": bool(submission.get("graded_at")),
+                        "excused": False,
+                        "late": False,
+                        "missing": False
+                    }
+                }
+                topic_id = assignment.get("discussion_topic")
+                if topic_id is not None:
+                    item.update({
+                        "plannable_id": topic_id,
+                        "plannable_type": "discussion_topic",
+                        "html_url": f"/courses/{course['id']}/discussion_topics/{topic_id}",
+                        "plannable": {
+                            "id": topic_id,
+                            "title": assignment["name"],
+                            "assignment_id": assignment["id"],
+                            "todo_date": None,
+                            "updated_at": "2025-01-16T08:00:00Z"
+                        }
+                    })
+                items.append(item)
+        return sorted(items, key=lambda item: item["plannable_date"])
+
+    def _graphql(self, query: str) -> Route:
+        """Answer the two query shapes the sync sends: all courses, and aliased course assignment pages"""
+        if not self.graphql:
+            return 200, {}, {"errors": [{"message": "GraphQL is not enabled"}]}
+
+        if "currentUser" in query:
+            enrollments = [{
+                "type": GRAPHQL_ENROLLMENT_TYPES[_enrollment(c)["type"]],
+                "state": _enrollment(c)["enrollment_state"],
+                "course": {"_id": str(c["id"]), "name": c["name"], "term": c["term"]}
+            } for c in self.semester["courses"]]
+            return 200, self._quota_headers(), {"data": {"currentUser": {"enrollments": enrollments}}}
+
+        data = {}
+        field = re.compile(r'(\w+): course\(id: "(\d+)"\) \{\s*assignmentsConnection\(first: (\d+)(?:, after: "([^"]*)")?\)')
+        for alias, course_id, first, after in field.findall(query):
+            assignments = self.semester["assignments"].get(int(course_id), [])
+            size = min(int(first), self.max_per_page)
+            start = int(after) if after else 0
+            chunk = assignments[start:start + size]
+            data[alias] = {"assignmentsConnection": {
+                "nodes": [_as_graphql_assignment(a) for a in chunk],
+                "pageInfo": {"hasNextPage": start + size < len(assignments), "endCursor": str(start + size)}
+            }}
+        return 200, self._quota_headers(), {"data": data}
+
+    def _quota_headers(self) -> Dict[str, str]:
+        return {"X-Rate-Limit-Remaining": str(self.rate_limit_remaining)}
+
+    def _paginate(self, items: List[Dict], path: str, query: Dict[str, List[str]],
+                  headers: Dict[str, str]) -> Route:
+        per_page = min(int(query.get("per_page", [self.default_per_page])[0]), self.max_per_page)
+        page = int(query.get("page", ["1"])[0])
+        chunk = items[(page - 1) * per_page:page * per_page]
+
+        response_headers = self._quota_headers()
+        if page * per_page < len(items):
+            next_query = dict(query)
+            next_query["page"] = [str(page + 1)]
+            next_url = f"http://{headers['Host']}{path}?{urlencode(next_query, doseq=True)}"
+            response_headers["Link"] = f'<{next_url}>; rel="next"'
+
+        etag = '"' + hashlib.sha1(json.dumps(chunk, sort_keys=True).encode("utf-8")).hexdigest() + '"'
+        response_headers["ETag"] = etag
+        if headers.get("If-None-Match") == etag:
+            return 304, response_headers, None
+        return 200, response_headers, chunk
+
+
+GRAPHQL_ENROLLMENT_TYPES = {"student": "StudentEnrollment", "ta": "TaEnrollment", "teacher": "TeacherEnrollment",
+                            "observer": "ObserverEnrollment"}
+
+
+def _enrollment(course: Dict) -> Dict:
+    """The user's enrollment in a course, as REST lists it; a course without one is an active student's"""
+    enrollments = course.get("enrollments") or [{"type": "student", "enrollment_state": "active"}]
+    return enrollments[0]
+
+
+def _graphql_time(value: Optional[str]) -> Optional[str]:
+    """Render a REST UTC timestamp with a local offset, as Canvas GraphQL does"""
+    if not value:
+        return None
+    parsed = datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone(timedelta(hours=-6))).isoformat()
+
+
+def _as_graphql_assignment(assignment: Dict) -> Dict:
+    submission = assignment.get("submission") or {}
+    submitted = submission.get("submitted_at")
+    return {
+        "_id": str(assignment["id"]),
+        "name": assignment["name"],
+        "dueAt": _graphql_time(assignment.get("due_at")),
+        "pointsPossible": assignment.get("points_possible"),
+        "htmlUrl": assignment.get("html_url"),
+        "updatedAt": _graphql_time(assignment.get("updated_at")),
+        # Like Canvas, unsubmitted placeholders are left out of the connection
+        "submissionsConnection": {"nodes": [{
+            "submittedAt": _graphql_time(submitted),
+            "gradedAt": _graphql_time(submission.get("graded_at"))
+        }] if submitted else []}
+    }
+
+
+def _as_page_property(prop: Dict) -> Dict:
+    """Convert a request-style property into the shape Notion returns"""
+    if "title" in prop or "rich_text" in prop:
+        key = "title" if "title" in prop else "rich_text"
+        fragments = []
+        for fragment in prop[key]:
+            content = fragment.get("text", {}).get("content", "")
+            fragments.append({"type": "text", "text": {"content": content, "link": None}, "plain_text": content})
+        return {"type": key, key: fragments}
+    if "url" in prop:
+        return {"type": "url", "url": prop["url"] or None}
+    if "date" in prop:
+        date = prop["date"]
+        return {"type": "date", "date": {"start": date["start"], "end": None, "time_zone": None} if date else None}
+    for key in ("number", "status", "select"):
+        if key in prop:
+            return {"type": key, key: prop[key]}
+    return prop
+
+
+# The database's properties before the sync started matching pages on a Canvas ID
+DATABASE_PROPERTIES = {"Name": "title", "Course": "rich_text", "Due Date": "date", "Points": "number",
+                       "Status": "status", "Submission Status": "select", "Canvas URL": "url"}
+
+
+class MockNotion(MockServer):
+    """Notion database retrieve/update, query, page create and page update endpoints.
+
+    Like Notion, writes naming a property the database doesn't have are
+    rejected with a 400.
+    """
+
+    def __init__(self, database_id: str = "mock-database", max_page_size: int = 100, **kwargs):
+        super().__init__(**kwargs)
+        self.database_id = database_id
+        self.max_page_size = max_page_size
+        self.pages: Dict[str, Dict] = {}
+        self.schema: Dict[str, str] = dict(DATABASE_PROPERTIES)
+
+    def page_titles(self) -> List[str]:
+        with self.lock:
+            return [page["properties"]["Name"]["title"][0]["plain_text"] for page in self.pages.values()]
+
+    def route(self, method, path, query, body, headers):
+        body = body or {}
+
+        if method == "POST" and path == f"/v1/databases/{self.database_id}/query":
+            return "query", self._query(body)
+
+        if path == f"/v1/databases/{self.database_id}" and method in ("GET", "PATCH"):
+            with self.lock:
+                for name, prop in body.get("properties", {}).items():
+                    self.schema[name] = next(iter(prop))
+                properties = {name: {"id": name, "name": name, "type": kind, kind: {}}
+                              for name, kind in self.schema.items()}
+            return "database", (200, {}, {"object": "database", "id": self.database_id, "properties": properties})
+
+        unknown = [name for name in body.get("properties", {}) if name not in self.schema]
+        if unknown and method in ("POST", "PATCH") and path.startswith("/v1/pages"):
+            return "invalid", (400, {}, {"object": "error", "status": 400, "code": "validation_error",
+                                         "message": f"{unknown[0]} is not a property that exists."})
+
+        if method == "POST" and path == "/v1/pages":
+            page_id = str(uuid.uuid4())
+            page = {
+                "object": "page",
+                "id": page_id,
+                "archived": False,
+                "parent": body.get("parent"),
+                "properties": {name: _as_page_property(prop) for name, prop in body.get("properties", {}).items()}
+            }
+            with self.lock:
+                self.pages[page_id] = page
+            return "create", (200, {}, page)
+
+        match = re.fullmatch(r"/v1/pages/([\w-]+)", path)
+        if method == "PATCH" and match:
+            with self.lock:
+                page = self.pages.get(match.group(1))
+                if page is None:
+                    return "update", (404, {}, {"object": "error", "code": "object_not_found"})
+                for name, prop in body.get("properties", {}).items():
+                    page["properties"][name] = _as_page_property(prop)
+                if "archived" in body:
+                    page["archived"] = body["archived"]
+            return "update", (200, {}, page)
+
+        return None
+
+    def _query(self, body: Dict) -> Route:
+        with self.lock:
+            pages = [page for page in self.pages.values() if not page["archived"]]
+
+        if body.get("filter"):
+            pages = [page for page in pages if self._matches(page, body["filter"])]
+
+        size = min(int(body.get("page_size", 100)), self.max_page_size)
+        start = int(body.get("start_cursor") or 0)
+        chunk = pages[start:start + size]
+        has_more = start + size < len(pages)
+        return 200, {}, {
+            "object": "list",
+            "results": chunk,
+            "has_more": has_more,
+            "next_cursor": str(start + size) if has_more else None
+        }
+
+    @classmethod
+    def _matches(cls, page: Dict, condition: Dict) -> bool:
+        if "and" in condition:
+            return all(cls._matches(page, part) for part in condition["and"])
+        if "or" in condition:
+            return any(cls._matches(page, part) for part in condition["or"])
+        prop = page["properties"].get(condition["property"], {})
+        for key in ("title", "rich_text"):
+            if key in condition:
+                text = "".join(fragment["plain_text"] for fragment in prop.get(key, []))
+                return text == condition[key]["equals"]
+        if "number" in condition:
+            return prop.get("number") == condition["number"]["equals"]
+        return True
+
+
+def point_syncer(syncer, canvas_url: str, notion_url: str, database_id: str = "mock-database") -> None:
+    """Aim a CanvasNotionSync at mock servers running at the given base URLs"""
+    syncer.canvas_base_url = f"{canvas_url}/api/v1"
+    syncer.notion_base_url = f"{notion_url}/v1"
+    syncer.notion_database_id = database_id
@@ -43,7 +43,7 @@ def test_current_courses():
     if not current_courses:
         print("No current semester courses found!")
     for course in current_courses:
-        print(f"- {course['name']} ({course['term']['name']})")
+        print(f"- {course.name} ({course.term})")
 
 if __name__ == "__main__":
     test_current_courses()
\ No newline at end of file
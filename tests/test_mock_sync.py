@@ -0,0 +1,785 @@
+import json
+import logging
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+# Add the parent directory to the path for importing main
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Configure logging first so CanvasNotionSync doesn't write to sync_log.txt
+logging.basicConfig(level=logging.WARNING, handlers=[logging.NullHandler()])
+
+from batch import load_accounts, run_batch, share_rates
+from daemon import SyncDaemon, poll_interval
+from http_cache import HttpCache
+from journal import SyncJournal
+from main import CanvasNotionSync, parse_args
+from plan import SyncPlan
+from sync_logging import configure_logging, shutdown_logging
+from mock_servers import MockCanvas, MockNotion, point_syncer, synthetic_semester
+
+
+class MockSyncTestCase(unittest.TestCase):
+    """Runs the sync against local mock servers instead of the live APIs"""
+
+    courses = 3
+    assignments_per_course = 25
+
+    def setUp(self):
+        self.semester = synthetic_semester(self.courses, self.assignments_per_course)
+        self.canvas = MockCanvas(self.semester).start()
+        self.notion = MockNotion().start()
+        self.addCleanup(self.canvas.stop)
+        self.addCleanup(self.notion.stop)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    def temp_path(self, *parts: str) -> str:
+        """A path in this test's temporary directory"""
+        return os.path.join(self.tmp, *parts)
+
+    def make_syncer(self, **kwargs) -> CanvasNotionSync:
+        kwargs.setdefault("canvas_rate", 1000)
+        kwargs.setdefault("notion_rate", 1000)
+        syncer = CanvasNotionSync("canvas-key", "canvas.example.edu", "notion-key", "mock-database", **kwargs)
+        point_syncer(syncer, self.canvas.url, self.notion.url, self.notion.database_id)
+        self.addCleanup(syncer.close)
+        return syncer
+
+    def expected_pages(self) -> int:
+        return self.courses * self.assignments_per_course
+
+
+class TestMockSync(MockSyncTestCase):
+    def test_sequential_sync_creates_every_assignment(self):
+        syncer = self.make_syncer(concurrent=False)
+        syncer.sync_assignments()
+        self.assertEqual(len(self.notion.pages), self.expected_pages())
+        self.assertEqual(syncer.stats.get("created"), self.expected_pages())
+
+    def test_date_restricted_courses_are_skipped(self):
+        self.semester["courses"].append({"id": 99, "access_restricted_by_date": True})
+        syncer = self.make_syncer()
+        syncer.sync_assignments()
+        self.assertEqual(len(self.notion.pages), self.expected_pages())
+
+    def test_concurrent_sync_matches_sequential(self):
+        syncer = self.make_syncer(concurrent=True)
+        syncer.sync_assignments()
+        self.assertEqual(len(self.notion.pages), self.expected_pages())
+        self.assertEqual(sorted(self.notion.page_titles()),
+                         sorted(a["name"] for c in self.semester["assignments"].values() for a in c))
+
+    def test_pagination_reads_past_first_page(self):
+        syncer = self.make_syncer()
+        assignments = syncer.get_course_assignments(1)
+        self.assertEqual(len(assignments), self.assignments_per_course)
+
+    def test_submission_status_comes_from_bulk_fetch(self):
+        syncer = self.make_syncer()
+        syncer.sync_assignments()
+        self.assertEqual(self.canvas.calls["submission"], 0)
+
+    def test_second_run_writes_nothing(self):
+        syncer = self.make_syncer()
+        syncer.sync_assignments()
+        writes = self.notion.calls["create"] + self.notion.calls["update"]
+
+        syncer.sync_assignments()
+        self.assertEqual(self.notion.calls["create"] + self.notion.calls["update"], writes)
+        self.assertEqual(syncer.stats.get("unchanged"), self.expected_pages())
+
+    def test_changed_assignment_updates_only_changed_property(self):
+        syncer = self.make_syncer()
+        syncer.sync_assignments()
+        self.semester["assignments"][1][0]["points_possible"] = 999.0
+
+        syncer.sync_assignments()
+        self.assertEqual(syncer.stats.get("updated"), 1)
+        page = next(p for p in self.notion.pages.values() if p["properties"]["Points"]["number"] == 999.0)
+        self.assertEqual(page["properties"]["Name"]["title"][0]["plain_text"], "Assignment 1")
+
+    def test_throttled_requests_are_retried(self):
+        self.notion.throttle_every = 7
+        self.notion.retry_after = 0.01
+        syncer = self.make_syncer()
+        syncer.sync_assignments()
+        self.assertGreater(self.notion.throttled, 0)
+        self.assertEqual(len(self.notion.pages), self.expected_pages())
+        self.assertEqual(syncer.stats.get("failed", 0), 0)
+
+
+class TestHttpCache(MockSyncTestCase):
+    def setUp(self):
+        super().setUp()
+        # Three pages per course, so cached responses have to replay their Link headers
+        self.canvas.max_per_page = 10
+        self.cache_dir = self.temp_path("cache")
+
+    def cached_syncer(self, **kwargs):
+        self.cache = HttpCache(self.cache_dir, **kwargs)
+        return self.make_syncer(cache=self.cache)
+
+    def test_unchanged_pages_are_revalidated(self):
+        syncer = self.cached_syncer()
+        first = syncer.get_course_assignments(1)
+        self.assertEqual((self.cache.misses, self.cache.hits), (3, 0))
+
+        self.cache.reset_stats()
+        self.assertEqual(syncer.get_course_assignments(1), first)
+        self.assertEqual((self.cache.revalidated, self.cache.hits, self.cache.misses), (3, 3, 0))
+        self.assertEqual(self.canvas.calls["assignments"], 6)
+
+    def test_fresh_entries_replay_every_page_without_requests(self):
+        syncer = self.cached_syncer(ttl=3600)
+        first = syncer.get_course_assignments(1)
+
+        self.assertEqual(syncer.get_course_assignments(1), first)
+        self.assertEqual(len(first), self.assignments_per_course)
+        self.assertEqual(self.canvas.calls["assignments"], 3)
+        self.assertEqual(self.cache.hits, 3)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        syncer = self.cached_syncer(ttl=3600)
+        syncer.get_course_assignments(1)
+        entry_bytes = sum(entry.stat().st_size for entry in os.scandir(self.cache_dir)) // 3
+
+        # Room for four pages: reading course 2 pushes out the oldest of course 1's
+        syncer = self.cached_syncer(ttl=3600, max_bytes=int(entry_bytes * 4.5))
+        syncer.get_course_assignments(1)
+        syncer.get_course_assignments(2)
+        self.assertLessEqual(self.cache._total_bytes, self.cache.max_bytes)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 4)
+
+        calls = self.canvas.calls["assignments"]
+        syncer.get_course_assignments(2)
+        self.assertEqual(self.canvas.calls["assignments"], calls)
+        syncer.get_course_assignments(1)
+        self.assertGreater(self.canvas.calls["assignments"], calls)
+
+    def test_corrupt_entries_are_refetched(self):
+        syncer = self.cached_syncer(ttl=3600)
+        first = syncer.get_course_assignments(1)
+        for entry in os.scandir(self.cache_dir):
+            with open(entry.path, "w", encoding="utf-8") as f:
+                f.write('{"url": "trunc')
+
+        syncer = self.cached_syncer(ttl=3600)
+        self.assertEqual(syncer.get_course_assignments(1), first)
+        self.assertEqual(self.cache.misses, 3)
+        self.assertEqual(syncer.get_course_assignments(1), first)
+        self.assertEqual(self.cache.hits, 3)
+
+
+class TestGraphQLFetch(MockSyncTestCase):
+    def test_graphql_records_match_rest(self):
+        self.make_syncer().sync_assignments()
+
+        syncer = self.make_syncer(canvas_graphql=True)
+        assignment_calls = self.canvas.calls["assignments"]
+        syncer.sync_assignments()
+        self.assertEqual(syncer.stats.get("unchanged"), self.expected_pages())
+        self.assertEqual(self.canvas.calls["graphql"], 2)
+        self.assertEqual(self.canvas.calls["assignments"], assignment_calls)
+        self.assertEqual(self.canvas.calls["submission"], 0)
+
+    def test_graphql_follows_assignment_pages(self):
+        self.canvas.max_per_page = 10
+        syncer = self.make_syncer(canvas_graphql=True)
+        syncer.sync_assignments()
+        self.assertEqual(len(self.notion.pages), self.expected_pages())
+        # One courses query, then one query per page of the longest course
+        self.assertEqual(self.canvas.calls["graphql"], 4)
+
+    def test_only_active_student_courses_are_synced(self):
+        self.semester["courses"][1]["enrollments"] = [{"type": "ta", "enrollment_state": "active"}]
+        self.semester["courses"][2]["enrollments"] = [{"type": "student", "enrollment_state": "completed"}]
+        rest = self.make_syncer().get_canvas_courses()
+
+        syncer = self.make_syncer(canvas_graphql=True)
+        self.assertEqual(syncer.get_canvas_courses(), rest)
+        self.assertEqual([course.id for course in rest], [self.semester["courses"][0]["id"]])
+        self.assertEqual(self.canvas.calls["graphql"], 2)
+
+    def test_graphql_errors_fall_back_to_rest(self):
+        self.canvas.graphql = False
+        syncer = self.make_syncer(canvas_graphql=True)
+        syncer.sync_assignments()
+        self.assertEqual(len(self.notion.pages), self.expected_pages())
+        self.assertEqual(self.canvas.calls["assignments"], self.courses)
+
+
+class TestPlannerWindow(MockSyncTestCase):
+    start = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    end = datetime(2025, 4, 1, tzinfo=timezone.utc)
+
+    def setUp(self):
+        super().setUp()
+        self.state_path = self.temp_path("state.db")
+        # Listed by the planner as a graded discussion rather than as the assignment
+        self.discussion = self.due_in_window()[0]
+        self.discussion["discussion_topic"] = 7000
+
+    def due_in_window(self):
+        return [a for c in self.semester["assignments"].values() for a in c if a["due_at"].startswith("2025-03")]
+
+    def test_window_syncs_only_due_assignments(self):
+        syncer = self.make_syncer(state_path=self.state_path)
+        syncer.sync_window(self.start, self.end)
+        self.assertEqual(sorted(self.notion.page_titles()), sorted(a["name"] for a in self.due_in_window()))
+        # Only the discussion's course is asked for the assignment behind it
+        self.assertEqual(self.canvas.calls["assignments"], 1)
+        self.assertEqual(self.canvas.calls["planner"], 1)
+
+    def test_discussion_keeps_its_assignment_fields(self):
+        syncer = self.make_syncer(state_path=self.state_path)
+        syncer.sync_window(self.start, self.end)
+        page = next(page for page in self.notion.pages.values()
+                    if page["properties"]["Name"]["title"][0]["plain_text"] == self.discussion["name"])
+        self.assertEqual(page["properties"]["Due Date"]["date"]["start"], self.discussion["due_at"][:10])
+        self.assertEqual(page["properties"]["Points"]["number"], self.discussion["points_possible"])
+        self.assertEqual(page["properties"]["Canvas URL"]["url"], self.discussion["html_url"])
+
+    def test_window_after_full_sync_is_cheap(self):
+        syncer = self.make_syncer(state_path=self.state_path)
+        syncer.sync_assignments()
+        notion_calls = self.notion.total_calls()
+
+        syncer.sync_window(self.start, self.end)
+        self.assertEqual(syncer.stats.get("skipped"), len(self.due_in_window()))
+        self.assertEqual(self.notion.total_calls(), notion_calls)
+
+    def test_full_sweep_runs_when_due(self):
+        syncer = self.make_syncer(state_path=self.state_path)
+        syncer.sync_window(self.start, self.end, full_sweep_hours=24)
+        self.assertEqual(len(self.notion.pages), self.expected_pages())
+
+        syncer.sync_window(self.start, self.end, full_sweep_hours=24)
+        self.assertEqual(self.canvas.calls["planner"], 1)
+
+
+class TestChangeProbe(MockSyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.state_path = self.temp_path("state.db")
+
+    def test_quiet_run_exits_after_probe(self):
+        syncer = self.make_syncer(state_path=self.state_path)
+        syncer.sync_assignments()
+        canvas_calls, notion_calls = self.canvas.total_calls(), self.notion.total_calls()
+
+        syncer.sync_assignments()
+        # The course list and one page of assignments per course
+        self.assertEqual(self.canvas.total_calls() - canvas_calls, 1 + self.courses)
+        self.assertEqual(self.notion.total_calls(), notion_calls)
+
+    def test_own_submission_runs_full_sync(self):
+        syncer = self.make_syncer(state_path=self.state_path)
+        syncer.sync_assignments()
+        submission = next(a["submission"] for a in self.semester["assignments"][2] if not a["submission"]["submitted_at"])
+        submission["submitted_at"] = "2025-02-01T09:00:00Z"
+        submission["workflow_state"] = "submitted"
+
+        syncer.sync_assignments()
+        self.assertEqual(syncer.stats.get("updated"), 1)
+
+    def test_new_assignment_runs_full_sync(self):
+        syncer = self.make_syncer(state_path=self.state_path)
+        syncer.sync_assignments()
+        added = dict(self.semester["assignments"][2][0], id=999999, name="Added Assignment")
+        added["submission"] = dict(added["submission"], assignment_id=999999)
+        self.semester["assignments"][2].append(added)
+
+        syncer.sync_assignments()
+        self.assertEqual(syncer.stats.get("created"), 1)
+
+    def test_assignment_edit_runs_full_sync_without_refetching(self):
+        syncer = self.make_syncer(state_path=self.state_path)
+        syncer.sync_assignments()
+        assignment = self.semester["assignments"][2][5]
+        assignment["due_at"] = "2025-05-01T23:59:00Z"
+        assignment["updated_at"] = "2025-02-01T09:00:00Z"
+        canvas_calls = self.canvas.total_calls()
+
+        syncer.sync_assignments()
+        self.assertEqual(syncer.stats.get("updated"), 1)
+        # The sync reuses the courses and assignments the probe read
+        self.assertEqual(self.canvas.total_calls() - canvas_calls, 1 + self.courses)
+
+    def test_edit_the_probe_misses_is_synced_by_the_full_sweep(self):
+        syncer = self.make_syncer(state_path=self.state_path)
+        syncer.sync_assignments()
+        # Left with its old updated_at, so only the full sweep sees it
+        self.semester["assignments"][2][5]["points_possible"] = 3.0
+
+        syncer.sync_assignments()
+        self.assertIsNone(syncer.stats.get("updated"))
+
+        stale = datetime.now(timezone.utc) - timedelta(hours=25)
+        syncer.state.set_meta("last_full_sync", stale.isoformat())
+        syncer.sync_assignments()
+        self.assertEqual(syncer.stats.get("updated"), 1)
+
+    def test_force_bypasses_probe(self):
+        syncer = self.make_syncer(state_path=self.state_path)
+        syncer.sync_assignments()
+        syncer.sync_assignments(force=True)
+        self.assertEqual(syncer.stats.get("skipped"), self.expected_pages())
+
+    def test_failed_run_is_not_skipped_next_time(self):
+        syncer = self.make_syncer(state_path=self.state_path)
+        original = syncer.create_page
+
+        def create_page(properties):
+            raise RuntimeError("Notion down")
+
+        syncer.create_page = create_page
+        syncer.sync_assignments()
+        self.assertEqual(syncer.stats.get("failed"), self.expected_pages())
+
+        syncer.create_page = original
+        syncer.sync_assignments()
+        self.assertEqual(syncer.stats.get("created"), self.expected_pages())
+
+
+class TestDaemon(MockSyncTestCase):
+    def wait_for(self, condition, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail("timed out waiting for the daemon")
+            time.sleep(0.02)
+
+    def start_daemon(self, syncer, **kwargs):
+        daemon = SyncDaemon(syncer, syncer.sync_assignments, **kwargs)
+        thread = threading.Thread(target=daemon.run, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(daemon.stop)
+        return daemon, thread
+
+    def test_poll_interval_tightens_near_deadlines(self):
+        now = datetime(2025, 3, 1, tzinfo=timezone.utc)
+        self.assertEqual(poll_interval([], now, 60, 3600), 3600)
+        self.assertEqual(poll_interval([now - timedelta(hours=1)], now, 60, 3600), 3600)
+        self.assertEqual(poll_interval([now + timedelta(days=3)], now, 60, 3600), 3600)
+        self.assertEqual(poll_interval([now + timedelta(hours=6), now + timedelta(days=2)], now, 60, 3600), 1800)
+        self.assertEqual(poll_interval([now + timedelta(minutes=5)], now, 60, 3600), 60)
+
+    def test_trigger_syncs_single_course(self):
+        syncer = self.make_syncer()
+        syncer.index_max_age = 3600
+        daemon, _ = self.start_daemon(syncer, min_interval=3600, max_interval=3600, trigger_port=0)
+        self.wait_for(lambda: daemon.cycles == 1 and daemon.trigger_url)
+        self.assertEqual(len(self.notion.pages), self.expected_pages())
+        index_calls = self.notion.calls["query"]
+        self.semester["assignments"][2][0]["points_possible"] = 7.0
+
+        response = requests.post(f"{daemon.trigger_url}/sync", params={"course": 2}, timeout=5)
+        self.assertEqual(response.status_code, 202)
+        self.wait_for(lambda: daemon.cycles == 2)
+        self.assertEqual(syncer.stats.get("updated"), 1)
+        self.assertEqual(syncer.stats.get("unchanged"), self.assignments_per_course - 1)
+        # The index from the first cycle is reused
+        self.assertEqual(self.notion.calls["query"], index_calls)
+
+        status = requests.get(f"{daemon.trigger_url}/status", timeout=5).json()
+        self.assertEqual(status["cycles"], 2)
+
+    def test_course_trigger_keeps_other_courses_deadlines(self):
+        soon = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(hours=1)
+        self.semester["assignments"][1][0]["due_at"] = soon.strftime("%Y-%m-%dT%H:%M:%SZ")
+        syncer = self.make_syncer()
+        daemon = SyncDaemon(syncer, syncer.sync_assignments, min_interval=60, max_interval=3600)
+
+        self.assertLess(daemon._run_cycle([None]), 3600)
+        # Course 2 alone has nothing due soon, but course 1's deadline still sets the pace
+        self.assertLess(daemon._run_cycle([2]), 3600)
+        self.assertIn(soon, daemon.due_dates)
+
+    def test_stop_ends_wait_promptly(self):
+        daemon, thread = self.start_daemon(self.make_syncer(), min_interval=3600, max_interval=3600)
+        self.wait_for(lambda: daemon.cycles == 1)
+        daemon.stop()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+
+class TestBatch(MockSyncTestCase):
+    def write_config(self, accounts) -> str:
+        path = self.temp_path("accounts.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"defaults": {"canvas_domain": "canvas.example.edu", "notion_api_key": "notion-key",
+                                    "canvas_rate": 1000, "notion_rate": 1000},
+                       "accounts": accounts}, f)
+        return path
+
+    def test_failing_account_does_not_affect_others(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            closed_port = sock.getsockname()[1]
+        config = self.write_config([
+            {"name": "good", "canvas_api_key": "key-1", "notion_database_id": "mock-database",
+             "canvas_base_url": f"{self.canvas.url}/api/v1", "notion_base_url": f"{self.notion.url}/v1"},
+            {"name": "unreachable", "canvas_api_key": "key-2", "notion_database_id": "other", "max_retries": 0,
+             "canvas_base_url": f"http://127.0.0.1:{closed_port}/api/v1", "notion_base_url": f"{self.notion.url}/v1"}
+        ])
+        report_path = self.temp_path("report.json")
+        args = parse_args(["--batch", config, "--batch-dir", self.temp_path("accounts"),
+                           "--batch-report", report_path, "--batch-workers", "2"])
+
+        results = run_batch(load_accounts(config), args)
+        self.assertEqual([r["name"] for r in results], ["good", "unreachable"])
+        self.assertTrue(results[0]["ok"])
+        self.assertEqual(results[0]["stats"].get("created"), self.expected_pages())
+        self.assertFalse(results[1]["ok"])
+        self.assertEqual(len(self.notion.pages), self.expected_pages())
+
+        with open(report_path, encoding="utf-8") as f:
+            report = json.load(f)
+        self.assertEqual((report["succeeded"], report["failed"]), (1, 1))
+        for name in ("good", "unreachable"):
+            self.assertTrue(os.path.exists(self.temp_path("accounts", name, "sync_log.txt")))
+        self.assertTrue(os.path.exists(self.temp_path("accounts", "good", "sync_state.db")))
+
+    def test_accounts_sharing_a_token_split_its_rate(self):
+        config = self.write_config([
+            {"name": "a", "canvas_api_key": "key-1", "notion_database_id": "db-a"},
+            {"name": "b", "canvas_api_key": "key-2", "notion_database_id": "db-b", "notion_rate": 6},
+            {"name": "c", "canvas_api_key": "key-2", "notion_database_id": "db-c", "notion_api_key": "other"}
+        ])
+        accounts = share_rates(load_accounts(config), workers=2)
+        self.assertEqual([a["canvas_rate"] for a in accounts], [1000, 500, 500])
+        # Two of the three on the shared Notion token can run at once
+        self.assertEqual([a["notion_rate"] for a in accounts], [500, 3, 1000])
+
+        accounts = share_rates(load_accounts(config), workers=1)
+        self.assertEqual([a["notion_rate"] for a in accounts], [1000, 6, 1000])
+
+    def test_config_errors_are_reported(self):
+        config = self.write_config([{"name": "a", "canvas_api_key": "key"}])
+        with self.assertRaises(ValueError):
+            load_accounts(config)
+
+
+class TestLogging(MockSyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.log_path = self.temp_path("sync_log.txt")
+        self.addCleanup(logging.basicConfig, level=logging.WARNING, handlers=[logging.NullHandler()], force=True)
+        self.addCleanup(shutdown_logging)
+
+    def read_log(self):
+        shutdown_logging()
+        with open(self.log_path, encoding="utf-8") as f:
+            return f.read().splitlines()
+
+    def test_json_lines_carry_run_course_and_assignment_ids(self):
+        configure_logging(self.log_path, json_lines=True, console=False, force=True)
+        syncer = self.make_syncer()
+        syncer.sync_assignments()
+
+        entries = [json.loads(line) for line in self.read_log()]
+        self.assertTrue(all(entry["run_id"] == syncer.run_id for entry in entries))
+        created = [entry for entry in entries if entry["message"].startswith("Creating new page")]
+        self.assertEqual(len(created), self.expected_pages())
+        self.assertTrue(all("course_id" in entry and "assignment_id" in entry for entry in created))
+
+    def test_assignment_lines_can_be_turned_off(self):
+        configure_logging(self.log_path, console=False, force=True)
+        self.make_syncer(assignment_logs="off").sync_assignments()
+        lines = self.read_log()
+        self.assertTrue(any("Sync stats" in line for line in lines))
+        self.assertFalse(any("Creating new page" in line for line in lines))
+
+    def test_log_file_rotates(self):
+        configure_logging(self.log_path, max_bytes=2000, backup_count=2, console=False, force=True)
+        self.make_syncer().sync_assignments()
+        self.read_log()
+        self.assertTrue(os.path.exists(self.log_path + ".1"))
+        self.assertFalse(os.path.exists(self.log_path + ".3"))
+
+
+class TestPipeline(MockSyncTestCase):
+    def test_small_queues_apply_backpressure(self):
+        syncer = self.make_syncer(queue_size=2)
+        syncer.sync_assignments()
+        self.assertEqual(len(self.notion.pages), self.expected_pages())
+        self.assertLessEqual(syncer.pipeline_stats["assignments_queue_max_depth"], 2)
+        self.assertLessEqual(syncer.pipeline_stats["changes_queue_max_depth"], 2)
+
+    def test_stage_counts_are_reported(self):
+        syncer = self.make_syncer()
+        syncer.sync_assignments()
+        stats = syncer.pipeline_stats
+        self.assertEqual(stats["fetch_items"], self.expected_pages())
+        self.assertEqual(stats["transform_items"], self.expected_pages())
+        self.assertEqual(stats["write_items"], self.expected_pages())
+        self.assertIn("pipeline", syncer.metrics.to_dict())
+
+    def test_failed_course_does_not_stop_other_courses(self):
+        syncer = self.make_syncer()
+        original = syncer.iter_course_assignments
+
+        def iter_course_assignments(course_id):
+            if course_id == 2:
+                raise RuntimeError("course unavailable")
+            return original(course_id)
+
+        syncer.iter_course_assignments = iter_course_assignments
+        with self.assertRaises(RuntimeError):
+            syncer.sync_assignments()
+        self.assertEqual(len(self.notion.pages), self.expected_pages() - self.assignments_per_course)
+
+
+class TestResume(MockSyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.journal_path = self.temp_path("journal.jsonl")
+
+    def test_interrupted_run_resumes_without_redoing_courses(self):
+        syncer = self.make_syncer(concurrent=False, journal_path=self.journal_path)
+        original = syncer.iter_course_assignments
+
+        def iter_course_assignments(course_id):
+            if course_id == 3:
+                raise RuntimeError("connection lost")
+            return original(course_id)
+
+        syncer.iter_course_assignments = iter_course_assignments
+        with self.assertRaises(RuntimeError):
+            syncer.sync_assignments()
+        self.assertTrue(os.path.exists(self.journal_path))
+
+        resumed = self.make_syncer(journal_path=self.journal_path)
+        assignment_calls = self.canvas.calls["assignments"]
+        resumed.sync_assignments()
+        self.assertEqual(len(self.notion.pages), self.expected_pages())
+        self.assertEqual(resumed.stats.get("created"), self.assignments_per_course)
+        # Only the unfinished course is fetched again
+        self.assertEqual(self.canvas.calls["assignments"] - assignment_calls, 1)
+        self.assertFalse(os.path.exists(self.journal_path))
+
+    def test_in_flight_create_is_reconciled_not_duplicated(self):
+        self.make_syncer().sync_assignments()
+        assignment = self.semester["assignments"][1][0]
+        with open(self.journal_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"event": "create", "assignment_id": assignment["id"],
+                                "name": assignment["name"], "course": "2025SP-BENCH-0001"}) + "\n")
+            f.write('{"event": "done", "assignm')
+
+        syncer = self.make_syncer(journal_path=self.journal_path)
+        syncer.sync_assignments()
+        self.assertEqual(len(self.notion.pages), self.expected_pages())
+        self.assertEqual(syncer.stats.get("resumed"), 1)
+        self.assertEqual(syncer.stats.get("created", 0), 0)
+
+    def test_in_flight_create_survives_a_second_interruption(self):
+        self.make_syncer().sync_assignments()
+        assignment = self.semester["assignments"][1][0]
+        with open(self.journal_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"event": "create", "assignment_id": assignment["id"],
+                                "name": assignment["name"], "course": "2025SP-BENCH-0001"}) + "\n")
+
+        # Dies after the journal is reopened but before in-flight creates are reconciled
+        interrupted = self.make_syncer(journal_path=self.journal_path)
+
+        def get_canvas_courses(prefetch_assignments=True):
+            raise RuntimeError("connection lost")
+
+        interrupted.get_canvas_courses = get_canvas_courses
+        with self.assertRaises(RuntimeError):
+            interrupted.sync_assignments()
+        self.assertIn(assignment["id"], SyncJournal(self.journal_path).load().in_flight)
+
+        syncer = self.make_syncer(journal_path=self.journal_path)
+        syncer.sync_assignments()
+        self.assertEqual(len(self.notion.pages), self.expected_pages())
+        self.assertEqual(syncer.stats.get("created", 0), 0)
+
+
+class TestPlanApply(MockSyncTestCase):
+    def test_plan_only_writes_nothing(self):
+        syncer = self.make_syncer()
+        plan = syncer.plan_sync()
+        self.assertEqual(plan.counts()["create"], self.expected_pages())
+        self.assertEqual(self.notion.calls["create"] + self.notion.calls["update"], 0)
+
+    def test_saved_plan_can_be_applied(self):
+        plan_path = self.temp_path("plan.json")
+        self.make_syncer().plan_sync(plan_path)
+
+        syncer = self.make_syncer()
+        syncer.apply_plan(SyncPlan.load(plan_path))
+        self.assertEqual(len(self.notion.pages), self.expected_pages())
+        self.assertEqual(syncer.stats.get("created"), self.expected_pages())
+
+    def test_applying_a_saved_plan_twice_creates_nothing_new(self):
+        plan_path = self.temp_path("plan.json")
+        self.make_syncer().plan_sync(plan_path)
+
+        self.make_syncer().apply_plan(SyncPlan.load(plan_path))
+        syncer = self.make_syncer()
+        syncer.apply_plan(SyncPlan.load(plan_path))
+        self.assertEqual(len(self.notion.pages), self.expected_pages())
+        self.assertEqual(syncer.stats.get("created", 0), 0)
+        self.assertEqual(syncer.stats.get("unchanged"), self.expected_pages())
+
+    def test_plan_older_than_the_last_applied_one_is_rejected(self):
+        state_path = self.temp_path("state.db")
+        old_path, new_path = self.temp_path("old.json"), self.temp_path("new.json")
+        self.make_syncer().plan_sync(old_path)
+        self.make_syncer().plan_sync(new_path)
+        self.make_syncer(state_path=state_path).apply_plan(SyncPlan.load(new_path))
+        writes = self.notion.calls["create"] + self.notion.calls["update"]
+
+        with self.assertRaisesRegex(ValueError, "before the last applied plan"):
+            self.make_syncer(state_path=state_path).apply_plan(SyncPlan.load(old_path))
+        self.assertEqual(self.notion.calls["create"] + self.notion.calls["update"], writes)
+
+    def test_plan_reports_updates_and_orphans(self):
+        syncer = self.make_syncer()
+        syncer.apply_plan()
+        self.semester["assignments"][2][3]["points_possible"] = 1.0
+        removed = self.semester["assignments"][3].pop()
+
+        plan = syncer.plan_sync()
+        counts = plan.counts()
+        self.assertEqual(counts["update"], 1)
+        self.assertEqual(counts["orphaned"], 1)
+        self.assertEqual(plan.by_action("update")[0].properties.keys(), {"Points"})
+        self.assertEqual(plan.by_action("orphaned")[0].name, removed["name"])
+
+
+class TestReconcile(MockSyncTestCase):
+    def archived_titles(self):
+        return sorted(page["properties"]["Name"]["title"][0]["plain_text"]
+                      for page in self.notion.pages.values() if page["archived"])
+
+    def test_missing_canvas_id_property_is_added_before_writing(self):
+        self.assertNotIn("Canvas ID", self.notion.schema)
+        syncer = self.make_syncer()
+        syncer.sync_assignments()
+        syncer.sync_assignments()
+        self.assertEqual(self.notion.schema["Canvas ID"], "number")
+        self.assertEqual(len(self.notion.pages), self.expected_pages())
+        # Checked once per syncer: the retrieve and the update
+        self.assertEqual(self.notion.calls["database"], 2)
+
+    def test_canvas_id_of_the_wrong_type_stops_the_run(self):
+        self.notion.schema["Canvas ID"] = "rich_text"
+        syncer = self.make_syncer()
+        with self.assertRaisesRegex(RuntimeError, "must be a number"):
+            syncer.sync_assignments()
+        self.assertEqual(self.notion.pages, {})
+
+    def test_renamed_assignment_keeps_its_page(self):
+        syncer = self.make_syncer()
+        syncer.sync_assignments()
+        self.semester["assignments"][1][0]["name"] = "Renamed Assignment"
+
+        syncer.sync_assignments()
+        self.assertEqual(len(self.notion.pages), self.expected_pages())
+        self.assertIn("Renamed Assignment", self.notion.page_titles())
+        self.assertEqual(syncer.stats.get("created", 0), 0)
+        self.assertEqual(syncer.stats.get("updated"), 1)
+
+    def test_assignments_with_the_same_name_get_their_own_pages(self):
+        assignments = self.semester["assignments"][1]
+        assignments[1]["name"] = assignments[0]["name"]
+        for concurrent in (False, True):
+            with self.subTest(concurrent=concurrent):
+                self.notion.pages.clear()
+                syncer = self.make_syncer(concurrent=concurrent)
+                syncer.sync_assignments()
+                self.assertEqual(len(self.notion.pages), self.expected_pages())
+
+                syncer.sync_assignments()
+                self.assertEqual(len(self.notion.pages), self.expected_pages())
+                self.assertEqual(syncer.stats.get("updated", 0), 0)
+
+    def test_same_name_without_index_does_not_take_another_assignments_page(self):
+        syncer = self.make_syncer()
+        syncer.sync_assignments()
+        course = self.semester["courses"][0]
+        first, second = syncer.get_course_assignments(course["id"])[:2]
+
+        # The second assignment is new to Notion and shares the first one's name
+        for page_id, page in list(self.notion.pages.items()):
+            if page["properties"]["Canvas ID"]["number"] == second.id:
+                del self.notion.pages[page_id]
+
+        syncer.page_index = None
+        syncer.process_assignment(second._replace(name=first.name), course["name"], course["id"])
+        self.assertEqual(len(self.notion.pages), self.expected_pages())
+        self.assertEqual(sorted(page["properties"]["Canvas ID"]["number"] for page in self.notion.pages.values()),
+                         sorted(a["id"] for c in self.semester["assignments"].values() for a in c))
+
+    def test_rename_without_index_matches_on_canvas_id(self):
+        syncer = self.make_syncer()
+        syncer.sync_assignments()
+        course = self.semester["courses"][0]
+        assignment = syncer.get_course_assignments(course["id"])[0]._replace(name="Renamed Assignment")
+
+        syncer.page_index = None
+        syncer.process_assignment(assignment, course["name"], course["id"])
+        self.assertEqual(len(self.notion.pages), self.expected_pages())
+        self.assertIn("Renamed Assignment", self.notion.page_titles())
+
+    def test_deleted_assignments_are_archived_without_extra_queries(self):
+        syncer = self.make_syncer(archive_orphans=True)
+        syncer.sync_assignments()
+        removed = sorted(self.semester["assignments"][2].pop()["name"] for _ in range(2))
+        queries = self.notion.calls["query"]
+
+        with self.assertLogs("main", level="INFO") as logs:
+            syncer.sync_assignments()
+        self.assertEqual(syncer.stats.get("archived"), 2)
+        self.assertEqual(self.archived_titles(), removed)
+        self.assertTrue(any("Sync stats:" in line and "2 archived" in line for line in logs.output))
+        # Only the index load; the orphans come from diffing it against Canvas
+        self.assertEqual(self.notion.calls["query"] - queries, 1)
+
+    def test_orphans_kept_unless_archiving_is_enabled(self):
+        syncer = self.make_syncer()
+        syncer.sync_assignments()
+        self.semester["assignments"][2].pop()
+
+        syncer.sync_assignments()
+        self.assertEqual(self.archived_titles(), [])
+        self.assertIsNone(syncer.stats.get("archived"))
+
+
+class TestMetricsExport(MockSyncTestCase):
+    def test_run_writes_json_and_prometheus_metrics(self):
+        json_path = self.temp_path("metrics.json")
+        prom_path = self.temp_path("metrics.prom")
+        profile_path = self.temp_path("run.prof")
+        syncer = self.make_syncer(metrics_json=json_path, metrics_prom=prom_path, profile_path=profile_path)
+        syncer.sync_assignments()
+
+        with open(json_path) as f:
+            summary = json.load(f)
+        self.assertEqual(summary["calls"]["notion"]["/v1/pages"]["200"], self.expected_pages())
+        self.assertIn("notion_write", summary["phases"])
+        self.assertEqual(summary["assignments"]["created"], self.expected_pages())
+
+        with open(prom_path) as f:
+            prom = f.read()
+        self.assertIn('canvas_notion_sync_http_requests{api="notion",endpoint="/v1/pages",status="200"}', prom)
+        self.assertIn("canvas_notion_sync_http_request_duration_seconds_bucket", prom)
+        self.assertTrue(os.path.getsize(profile_path) > 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -23,17 +23,17 @@ def test_sync():
         return
         
     test_course = courses[0]
-    print(f"Testing with course: {test_course['name']}")
+    print(f"Testing with course: {test_course.name}")
     
     # Get assignments for test course
-    assignments = syncer.get_course_assignments(test_course['id'])
+    assignments = syncer.get_course_assignments(test_course.id)
     print(f"Found {len(assignments)} assignments")
     
     # Sync first assignment only
     if assignments:
         test_assignment = assignments[0]
-        print(f"Testing sync with assignment: {test_assignment['name']}")
-        syncer.create_notion_page(test_assignment, test_course['name'])
+        print(f"Testing sync with assignment: {test_assignment.name}")
+        syncer.process_assignment(test_assignment, test_course.name, test_course.id)
         print("Test sync completed!")
 
 if __name__ == "__main__":
@@ -0,0 +1,80 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_cache import HttpCache
+from metrics import SyncMetrics
+from rate_limit import RequestScheduler
+
+# (connect, read) timeouts in seconds applied to every request
+DEFAULT_TIMEOUT = (10.0, 30.0)
+
+
+class HttpTransport:
+    """Keep-alive HTTP client for one API.
+
+    Owns a requests.Session whose connection pool is sized to the
+    concurrency level, the headers every request shares and default
+    timeouts. A semaphore caps in-flight requests at the pool size. The
+    scheduler (rate limiting and retries), cache and metrics are optional
+    hooks applied to every request that goes through the transport.
+    """
+
+    def __init__(self, headers: Dict[str, str], pool_size: int = 4,
+                 timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+                 scheduler: Optional[RequestScheduler] = None, cache: Optional[HttpCache] = None,
+                 metrics: Optional[SyncMetrics] = None, name: str = "http"):
+        self.name = name
+        self.metrics = metrics
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self.scheduler = scheduler
+        self.cache = cache
+        self.limit = threading.BoundedSemaphore(self.pool_size)
+
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method: str, url: str, idempotent: bool = True, **kwargs) -> requests.Response:
+        """Send a request through the scheduler, with the default timeout unless one is given"""
+        kwargs.setdefault('timeout', self.timeout)
+
+        def send() -> requests.Response:
+            with self.limit:
+                if self.metrics is None:
+                    return self.session.request(method, url, **kwargs)
+
+                started = time.perf_counter()
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except requests.RequestException:
+                    self.metrics.record_call(self.name, url, "error", time.perf_counter() - started, 0, 0)
+                    raise
+                body = response.request.body if response.request is not None else None
+                self.metrics.record_call(
+                    self.name, url, response.status_code, time.perf_counter() - started,
+                    len(body) if body else 0, len(response.content)
+                )
+                return response
+
+        if self.scheduler is None:
+            return send()
+        return self.scheduler.send(send, idempotent=idempotent)
+
+    def get(self, url: str, params: Optional[Dict] = None) -> requests.Response:
+        """GET a URL, going through the cache when one is configured"""
+        if self.cache is None:
+            return self.request("GET", url, params=params)
+        return self.cache.fetch(
+            lambda extra_headers: self.request("GET", url, params=params, headers=extra_headers),
+            url, params, self.session.headers
+        )
+
+    def close(self) -> None:
+        self.session.close()